@@ -28,13 +28,12 @@ from utils.auth import init_google_auth # Not directly used, but keep if planned
 from utils.real_data_provider import RealDataProvider
 from utils.nl_to_sql import NLToSQLConverter
 from utils.bigquery_schema import get_bigquery_schema
+from utils.logger import configure_app_logging
 
 from models.llm_interface import LLMInterface
 
-# Configure logging
-# Ensure your logger is configured to show DEBUG level if you use logger.debug
-logging.basicConfig(level=logging.INFO, # Consider logging.DEBUG for more verbose output during debugging
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configure logging once on the root logger; module loggers propagate to it
+configure_app_logging()
 logger = logging.getLogger(__name__)
 
 # Configure Streamlit page
@@ -6,9 +6,8 @@ import streamlit as st
 from typing import Callable, Optional
 import logging
 import re
-from utils.logger import setup_logger
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 
 class QueryInput:
     """Component for entering natural language queries."""
@@ -20,7 +19,7 @@ class QueryInput:
         Args:
             on_query_submit (Callable[[str], None]): Callback function when query is submitted
         """
-        self.logger = setup_logger(__name__)
+        self.logger = logging.getLogger(__name__)
         self.logger.info("QueryInput component initialized")
         self.on_query_submit = on_query_submit
         
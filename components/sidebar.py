@@ -6,9 +6,8 @@ import streamlit as st
 from typing import Dict, Any, List, Optional, Callable
 import logging
 from datetime import datetime
-from utils.logger import setup_logger
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 
 class Sidebar:
     """Component for the sidebar with filters and settings."""
@@ -23,7 +22,7 @@ class Sidebar:
         """
         self.available_years = available_years or []
         self.on_filter_change = on_filter_change
-        self.logger = setup_logger(__name__)
+        self.logger = logging.getLogger(__name__)
         self.logger.info("Sidebar component initialized")
         
         # Administrative branches mapping (common ones)
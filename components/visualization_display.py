@@ -8,20 +8,18 @@ import plotly.graph_objects as go
 from typing import Dict, Any, Optional
 import logging
 from utils.visualization import FinancialDataVisualizer # Assuming this path is correct
-from utils.logger import setup_logger # Assuming this path is correct
 import os
 import traceback # Import the traceback module
 
-# Ensure logger is set up at the module level if not already
-# If setup_logger is idempotent, this is fine. Otherwise, ensure it's called once.
-logger = setup_logger(__name__)
+# No handlers here: records propagate to the root logger set up by configure_app_logging
+logger = logging.getLogger(__name__)
 
 class VisualizationDisplay:
     """Component for displaying query results and visualizations."""
 
     def __init__(self):
         """Initialize the visualization display component with proper logging."""
-        self.logger = setup_logger(__name__) # Or just use the module-level logger
+        self.logger = logger
         self.logger.info("VisualizationDisplay component initialized")
         self.visualizer = FinancialDataVisualizer()
 
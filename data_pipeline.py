@@ -14,6 +14,8 @@ import requests
 import io
 from typing import Dict, Any, Optional, List
 import sys
+import threading
+from pathlib import Path
 from utils.auth import init_google_auth
 from utils.logging_config import configure_logging
 
@@ -31,8 +33,41 @@ PROJECT_ID = os.getenv('PROJECT_ID')
 DATASET_ID = os.getenv('DATASET_ID')
 TABLE_ID = os.getenv('TABLE_ID')
 PROGRESS_FILE = 'extraction_progress.json'
+CACHE_DIR = Path('cache')  # Local Parquet copies of already-fetched API responses
+OPEN_PERIOD_CACHE_TTL = 6 * 3600  # Seconds a cached period that hasn't ended yet stays valid
 API_BASE_URL = "https://api.tutkihallintoa.fi/valtiontalous/v1/budjettitaloudentapahtumat"
-REQUEST_DELAY = 3.0  # Seconds between requests to avoid rate limiting
+REQUEST_DELAY = 3.0  # Average seconds between requests to avoid rate limiting
+REQUEST_BURST = 5  # Requests allowed back-to-back before throttling kicks in
+
+class _TokenBucket:
+    """Thread-safe token bucket rate limiter based on the monotonic clock."""
+
+    def __init__(self, capacity: int, refill_rate: float):
+        """
+        Args:
+            capacity (int): Maximum number of tokens (burst size)
+            refill_rate (float): Tokens added per second
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.refill_rate)
+            self.last = now
+            if self.tokens < 1:
+                sleep_time = (1 - self.tokens) / self.refill_rate
+                logger.debug(f"Rate limiting: Sleeping for {sleep_time:.2f} seconds")
+                time.sleep(sleep_time)
+                self.tokens = 0.0
+                self.last = time.monotonic()
+            else:
+                self.tokens -= 1
 
 class DataPipeline:
     """Pipeline for extracting financial data from Tutkihallintoa API and loading it to BigQuery."""
@@ -41,7 +76,7 @@ class DataPipeline:
         """Initialize the data pipeline."""
         logger.debug("Initializing DataPipeline class...")
         self.session = requests.Session()
-        self.last_request_time = 0
+        self._bucket = _TokenBucket(capacity=REQUEST_BURST, refill_rate=1.0 / REQUEST_DELAY)
         self.bq_client = bigquery.Client(project=PROJECT_ID)
         self.table_ref = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
         self.progress = self._load_progress()
@@ -69,18 +104,54 @@ class DataPipeline:
             json.dump(self.progress, f, indent=2)
         logger.info(f"Progress saved to {PROGRESS_FILE}")
     
+    def _cache_path(self, year: int, month_from: int, month_to: int, ha_tunnus: str) -> Path:
+        """Return the Parquet cache path for one API request period."""
+        return CACHE_DIR / f"{year}-{month_from:02d}-{month_to:02d}-{ha_tunnus}.parquet"
+
+    @staticmethod
+    def _period_closed(year: int, month_to: int) -> bool:
+        """Whether a request period has ended, so its data can no longer grow."""
+        today = datetime.now()
+        return (year, month_to) < (today.year, today.month)
+
+    def _read_cache(self, path: Path, closed: bool = True) -> Optional[pd.DataFrame]:
+        """
+        Read a previously fetched period from the local Parquet cache.
+
+        Args:
+            path (Path): Cache file of the period
+            closed (bool): Whether the period has ended; caches of open periods
+                (the current month or quarter) expire after OPEN_PERIOD_CACHE_TTL
+
+        Returns:
+            Optional[pd.DataFrame]: Cached data, or None if missing, stale or unreadable
+        """
+        try:
+            if not closed and time.time() - path.stat().st_mtime > OPEN_PERIOD_CACHE_TTL:
+                logger.info(f"Cache file {path} covers an open period and has expired")
+                return None
+        except FileNotFoundError:
+            return None
+        try:
+            df = pd.read_parquet(path)
+            logger.info(f"Loaded {len(df)} rows from cache {path}")
+            return df
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache file {path}: {str(e)}")
+            return None
+
+    def _write_cache(self, df: pd.DataFrame, path: Path):
+        """Persist a fetched period as Parquet so repeat runs skip the API and CSV parsing."""
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(path, compression='zstd', index=False)
+        except Exception as e:
+            logger.warning(f"Failed to write cache file {path}: {str(e)}")
+    
     def _respect_rate_limit(self):
         """Ensure we wait enough time between requests to avoid rate limiting."""
         logger.debug("Checking rate limit before making API request...")
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        
-        if time_since_last_request < REQUEST_DELAY:
-            sleep_time = REQUEST_DELAY - time_since_last_request
-            logger.debug(f"Rate limiting: Sleeping for {sleep_time:.2f} seconds")
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
+        self._bucket.acquire()
     
     def extract_month_data(self, year: int, month: int, ha_tunnus: str = '28') -> Optional[pd.DataFrame]:
         """
@@ -94,6 +165,11 @@ class DataPipeline:
         Returns:
             Optional[pd.DataFrame]: Extracted data as DataFrame or None if failed
         """
+        cache_path = self._cache_path(year, month, month, ha_tunnus)
+        cached = self._read_cache(cache_path, self._period_closed(year, month))
+        if cached is not None:
+            return cached
+
         self._respect_rate_limit()
         
         params = {
@@ -111,13 +187,18 @@ class DataPipeline:
             response = self.session.get(API_BASE_URL, params=params)
             
             if not response.ok:
-                logger.error(f"API request failed with status {response.status_code}: {response.text[:200]}")
+                logger.error("API request failed with status %s", response.status_code)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Response body (truncated): %r", response.content[:200])
                 return None
+
+            logger.debug("Response content length: %s", response.headers.get('Content-Length', '?'))
             
-            # Parse CSV data
+            # Parse CSV bytes directly with the multithreaded Arrow reader
             try:
-                df = pd.read_csv(io.StringIO(response.text), sep=',')
+                df = pd.read_csv(io.BytesIO(response.content), sep=',', engine='pyarrow')
                 logger.info(f"Successfully extracted {len(df)} rows for {year}-{month:02d}")
+                self._write_cache(df, cache_path)
                 return df
             except Exception as e:
                 logger.error(f"Failed to parse CSV response: {str(e)}")
@@ -139,12 +220,17 @@ class DataPipeline:
         Returns:
             Optional[pd.DataFrame]: Extracted data as DataFrame or None if failed
         """
-        self._respect_rate_limit()
-
         # Calculate start and end months for the quarter
         start_month = (quarter - 1) * 3 + 1
         end_month = quarter * 3
 
+        cache_path = self._cache_path(year, start_month, end_month, ha_tunnus)
+        cached = self._read_cache(cache_path, self._period_closed(year, end_month))
+        if cached is not None:
+            return cached
+
+        self._respect_rate_limit()
+
         params = {
             'yearFrom': year,
             'yearTo': year,
@@ -160,13 +246,18 @@ class DataPipeline:
             response = self.session.get(API_BASE_URL, params=params)
 
             if not response.ok:
-                logger.error(f"API request failed with status {response.status_code}: {response.text[:200]}")
+                logger.error("API request failed with status %s", response.status_code)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Response body (truncated): %r", response.content[:200])
                 return None
 
-            # Parse CSV data
+            logger.debug("Response content length: %s", response.headers.get('Content-Length', '?'))
+
+            # Parse CSV bytes directly with the multithreaded Arrow reader
             try:
-                df = pd.read_csv(io.StringIO(response.text), sep=',')
+                df = pd.read_csv(io.BytesIO(response.content), sep=',', engine='pyarrow')
                 logger.info(f"Successfully extracted {len(df)} rows for {year} Q{quarter}")
+                self._write_cache(df, cache_path)
                 return df
             except Exception as e:
                 logger.error(f"Failed to parse CSV response: {str(e)}")
@@ -191,8 +282,11 @@ class DataPipeline:
             return False
         
         try:
-            # Handle NaN values
-            df = df.where(pd.notnull(df), None)
+            # Handle NaN values in object columns only; pyarrow already writes
+            # numeric NaN as NULL, so those columns don't need a mask
+            object_cols = df.select_dtypes(include='object').columns
+            if len(object_cols):
+                df = df.assign(**{col: df[col].where(df[col].notna(), None) for col in object_cols})
             
             # Load data to BigQuery
             job_config = bigquery.LoadJobConfig(
@@ -117,6 +117,8 @@ class LLMInterface:
             sql, explanation = self._extract_sql_and_explanation(response.text)
 
             if sql:
+                # The prompt examples query a `<TABLE>` placeholder; point copies at the real table
+                sql = PromptTemplates.resolve_table_placeholder(sql, table_name)
                 logger.info(f"Generated SQL query: {sql}")
             else:
                 logger.warning("Failed to extract SQL from response")
@@ -0,0 +1,25 @@
+import unittest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from utils.bigquery_client import arrow_dtype_mapper
+
+class TestArrowDtypeMapper(unittest.TestCase):
+    def test_null_numbers_become_nan(self):
+        table = pa.table({
+            'total': pa.array([None], pa.float64()),
+            'year': pa.array([None], pa.int64()),
+            'name': pa.array([None], pa.string()),
+        })
+        df = table.to_pandas(types_mapper=arrow_dtype_mapper)
+        self.assertEqual(df['total'].dtype, np.float64)
+        self.assertEqual(df['year'].dtype, np.float64)
+        self.assertTrue(np.isnan(df['total'].iloc[0]))
+        self.assertIsInstance(df['name'].dtype, pd.ArrowDtype)
+
+    def test_integers_without_nulls_stay_integers(self):
+        df = pa.table({'Vuosi': [2022, 2023]}).to_pandas(types_mapper=arrow_dtype_mapper)
+        self.assertEqual(df['Vuosi'].dtype, np.int64)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest import mock
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.api_core.exceptions import GoogleAPIError
+from utils.bigquery_loader import BigQueryLoader
+
+class TestBigQueryLoader(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.client.load_table_from_file.side_effect = self._load
+        self.loads = []
+        with mock.patch('utils.bigquery_loader.get_bq_client', return_value=self.client):
+            self.loader = BigQueryLoader("project", "dataset", "table")
+
+    def _load(self, buf, table_ref, job_config):
+        self.loads.append((pq.ParquetFile(buf), table_ref, job_config))
+        return mock.MagicMock(job_id=f"job-{len(self.loads)}")
+
+    def test_large_frame_is_one_load_job_with_row_groups(self):
+        df = pd.DataFrame({'Vuosi': [2022.0] * 5, 'Kk': range(1, 6), 'Nettokertymä': [1, 2, 3, 4, 5]})
+        job_id = self.loader.load_dataframe(df, write_disposition="WRITE_TRUNCATE", row_group_size=2)
+
+        self.assertEqual(job_id, "job-1")
+        self.assertEqual(len(self.loads), 1)
+        parquet, table_ref, job_config = self.loads[0]
+        self.assertEqual(table_ref, "project.dataset.table")
+        self.assertEqual(job_config.write_disposition, "WRITE_TRUNCATE")
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        self.assertEqual(parquet.metadata.num_rows, 5)
+
+    def test_columns_typed_by_bigquery_schema(self):
+        df = pd.DataFrame({'Vuosi': [2022.0], 'Nettokertymä': [5], 'extra': [True]})
+        self.loader.load_dataframe(df)
+
+        schema = self.loads[0][0].schema_arrow
+        self.assertEqual(schema.field('Vuosi').type, pa.int64())
+        self.assertEqual(schema.field('Nettokertymä').type, pa.float64())
+        self.assertEqual(schema.field('extra').type, pa.bool_())
+
+    def test_load_invalidates_query_caches(self):
+        with mock.patch('utils.bigquery_loader.invalidate_query_caches') as invalidate:
+            self.loader.load_dataframe(pd.DataFrame({'Kk': [1]}))
+        invalidate.assert_called_once()
+
+    def test_failed_load_returns_none(self):
+        self.client.load_table_from_file.side_effect = GoogleAPIError("quota exceeded")
+        self.assertIsNone(self.loader.load_dataframe(pd.DataFrame({'Kk': [1]})))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from utils.gencache import StructuralCache, ADAPTED_EXPLANATION
+
+class TestStructuralCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = StructuralCache()
+
+    def test_template_reused_for_other_year_and_ministry(self):
+        stored = self.cache.store(
+            "What was the military budget for 2022?",
+            "SELECT SUM(`Voimassaoleva_talousarvio`) FROM `t` WHERE Vuosi = 2022 AND Ha_Tunnus = '26'",
+            "Sums the current budget for the defense ministry."
+        )
+        self.assertTrue(stored)
+        sql, explanation = self.cache.lookup("What was the education budget for 2023?")
+        self.assertEqual(sql, "SELECT SUM(`Voimassaoleva_talousarvio`) FROM `t` WHERE Vuosi = 2023 AND Ha_Tunnus = '29'")
+        self.assertEqual(explanation, ADAPTED_EXPLANATION)
+
+    def test_context_must_match(self):
+        self.cache.store("budget 2022", "SELECT 1 FROM `t` WHERE Vuosi = 2022", "For 2022.", context=(2022, 2022))
+        self.assertIsNone(self.cache.lookup("budget 2023", context=(2023, 2023)))
+        self.assertEqual(self.cache.lookup("budget 2023", context=(2022, 2022)),
+                         ("SELECT 1 FROM `t` WHERE Vuosi = 2023", "For 2023."))
+
+    def test_ambiguous_or_unused_slots_not_stored(self):
+        self.assertFalse(self.cache.store("budget 2022 vs 2022", "SELECT 1 WHERE Vuosi = 2022", ""))
+        self.assertFalse(self.cache.store("budget 2022", "SELECT 1", ""))
+        self.assertFalse(self.cache.store("total budget", "SELECT 1", ""))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from utils import query_handler
+from utils.query_handler import QueryHandler
+
+class TestQueryHandler(unittest.TestCase):
+    def setUp(self):
+        config = SimpleNamespace(project_id="project", dataset_id="dataset", table_id="table")
+        for patcher in (mock.patch('utils.query_handler.NLToSQLConverter'),
+                        mock.patch('utils.real_data_provider.get_bq_client'),
+                        mock.patch.object(QueryHandler, '_structural_cache')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        QueryHandler._structural_cache.lookup.return_value = None
+        self.handler = QueryHandler(config=config)
+        self.converter = self.handler.nl_converter
+        self.converter.session_context.return_value = ({}, (2022, 2023))
+        self.handler.data_provider.execute_query = mock.MagicMock()
+
+    def test_uses_configured_table(self):
+        self.assertEqual(self.handler.data_provider.table_ref, "project.dataset.table")
+        query_handler.NLToSQLConverter.assert_called_once_with(table_name="project.dataset.table")
+
+    def test_process_queries_generates_sql_in_one_batch(self):
+        self.converter.generate_sql_batch.return_value = [("SELECT 1", "one"), ("SELECT 2", "two")]
+        results = asyncio.run(self.handler.process_queries(["q1", "q2"]))
+
+        self.converter.generate_sql_batch.assert_called_once_with(["q1", "q2"])
+        self.assertEqual([result['sql'] for result in results], ["SELECT 1", "SELECT 2"])
+        self.assertEqual(self.handler.data_provider.execute_query.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
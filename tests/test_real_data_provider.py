@@ -1,5 +1,8 @@
 import unittest
+from unittest import mock
+import pyarrow as pa
 from utils.real_data_provider import RealDataProvider
+from utils.query_cache import invalidate_query_caches
 
 class TestRealDataProvider(unittest.TestCase):
     def setUp(self):
@@ -11,5 +14,46 @@ class TestRealDataProvider(unittest.TestCase):
         prepared_query = self.provider._prepare_sql_query(query)
         self.assertEqual(prepared_query, expected_query)
 
+class TestRealDataProviderResultCache(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.client.query.side_effect = self._query
+        for target, value in (('get_bq_client', self.client), ('get_bqstorage_client', None)):
+            patcher = mock.patch(f'utils.real_data_provider.{target}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        RealDataProvider.refresh()
+        self.addCleanup(RealDataProvider.refresh)
+        self.provider = RealDataProvider()
+
+    def _query(self, sql, job_config=None):
+        results = mock.MagicMock()
+        results.to_arrow.return_value = pa.table({'total': [1.5]})
+        return mock.MagicMock(**{'result.return_value': results})
+
+    def test_repeated_query_served_from_cache(self):
+        first = self.provider.execute_query("SELECT SUM(x) AS total FROM t")
+        second = self.provider.execute_query("SELECT SUM(x) AS total FROM t")
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertEqual(second['total'].tolist(), [1.5])
+        self.assertIsNot(first, second)
+
+    def test_nondeterministic_query_not_cached(self):
+        self.provider.execute_query("SELECT CURRENT_DATE() AS total")
+        self.provider.execute_query("SELECT CURRENT_DATE() AS total")
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_refresh_drops_cached_results(self):
+        self.provider.execute_query("SELECT 1 AS total")
+        RealDataProvider.refresh()
+        self.provider.execute_query("SELECT 1 AS total")
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_invalidation_drops_cached_results(self):
+        self.provider.execute_query("SELECT 1 AS total")
+        invalidate_query_caches()
+        self.provider.execute_query("SELECT 1 AS total")
+        self.assertEqual(self.client.query.call_count, 2)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import functools
+import unittest
+from unittest import mock
+import pyarrow as pa
+from cachetools import TTLCache
+from utils import sql_executor
+from utils.sql_executor import SQLExecutor
+from utils.query_cache import invalidate_query_caches
+
+class TestSQLExecutor(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.client.query.side_effect = self._query
+        with mock.patch('utils.sql_executor.get_bq_client', return_value=self.client):
+            self.executor = SQLExecutor("project", max_bytes_scanned=1000)
+        storage_patch = mock.patch('utils.sql_executor.get_bqstorage_client', return_value=None)
+        storage_patch.start()
+        self.addCleanup(storage_patch.stop)
+
+    def _query(self, sql, job_config=None, **kwargs):
+        results = mock.MagicMock(total_rows=1)
+        results.to_arrow.return_value = pa.table({'total': [1.5]})
+        results.to_arrow_iterable.return_value = iter(pa.table({'total': [1.5]}).to_batches())
+        return mock.MagicMock(**{'result.return_value': results})
+
+    def test_every_job_is_capped_by_billed_bytes(self):
+        self.executor.execute_query("SELECT 1")
+        self.executor.execute_query_with_parameters("SELECT @year", {'year': 2022})
+        list(self.executor.execute_query_batches("SELECT 2"))
+
+        configs = [call.kwargs['job_config'] for call in self.client.query.call_args_list]
+        self.assertEqual(len(configs), 3)
+        self.assertTrue(all(config.maximum_bytes_billed == 1000 for config in configs))
+        self.assertFalse(any(config.dry_run for config in configs))
+        self.assertEqual(len({id(config) for config in configs}), 3)
+
+    def test_no_cap_when_disabled(self):
+        self.executor.max_bytes_scanned = None
+        self.executor.execute_query("SELECT 1")
+        self.assertIsNone(self.client.query.call_args.kwargs['job_config'].maximum_bytes_billed)
+
+    def test_repeated_query_served_from_cache(self):
+        first = self.executor.execute_query("SELECT 1")
+        first['total'] = 0.0  # Callers may modify their copy
+        second = self.executor.execute_query("SELECT 1")
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertEqual(second['total'].tolist(), [1.5])
+
+    def test_cache_keyed_on_max_results(self):
+        self.executor.execute_query("SELECT 1", max_results=10)
+        self.executor.execute_query("SELECT 1", max_results=20)
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_nondeterministic_query_not_cached(self):
+        self.executor.execute_query("SELECT CURRENT_DATE() AS total")
+        self.executor.execute_query("SELECT CURRENT_DATE() AS total")
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_least_recently_used_entry_evicted(self):
+        with mock.patch.object(sql_executor, 'CACHE_MAX_ENTRIES', 2), \
+                mock.patch('utils.sql_executor.get_bq_client', return_value=self.client):
+            self.executor = SQLExecutor("project")
+            for sql in ("SELECT 1", "SELECT 2", "SELECT 1", "SELECT 3", "SELECT 1", "SELECT 2"):
+                self.executor.execute_query(sql)
+        # SELECT 1 stayed cached as the most recently used; SELECT 2 was evicted by SELECT 3
+        self.assertEqual([call.args[0] for call in self.client.query.call_args_list],
+                         ["SELECT 1", "SELECT 2", "SELECT 3", "SELECT 2"])
+
+    def test_cached_result_expires(self):
+        clock = [1000.0]
+        ttl_cache = functools.partial(TTLCache, timer=lambda: clock[0])
+        with mock.patch.object(sql_executor, 'CACHE_TTL', 60), mock.patch.object(sql_executor, 'TTLCache', ttl_cache), \
+                mock.patch('utils.sql_executor.get_bq_client', return_value=self.client):
+            self.executor = SQLExecutor("project")
+        self.executor.execute_query("SELECT 1")
+        clock[0] += 30
+        self.executor.execute_query("SELECT 1")
+        clock[0] += 31
+        self.executor.execute_query("SELECT 1")
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_invalidation_drops_cached_results(self):
+        self.executor.execute_query("SELECT 1")
+        invalidate_query_caches()
+        self.executor.execute_query("SELECT 1")
+        self.assertEqual(self.client.query.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
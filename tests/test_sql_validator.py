@@ -0,0 +1,37 @@
+import unittest
+from utils.sql_validator import SQLValidator
+
+class TestSQLValidatorParsing(unittest.TestCase):
+    def setUp(self):
+        # Parsing and merging don't touch the model
+        self.validator = SQLValidator.__new__(SQLValidator)
+
+    def test_verdict_after_code_output(self):
+        reply = (
+            'cols = {"Vuosi": "INTEGER", "Kk": "INTEGER"}\n'
+            'print({"checked": 2})\n'
+            '{"checked": 2}\n'
+            'Result:\n'
+            '{"is_valid": true, "syntax_errors": [], "field_errors": [], '
+            '"warnings": ["no LIMIT"], "suggestions": []}'
+        )
+        result, parsed = self.validator._parse_validation_result(reply)
+        self.assertTrue(parsed)
+        self.assertTrue(result["is_valid"])
+        self.assertEqual(result["warnings"], ["no LIMIT"])
+
+    def test_reply_without_verdict_not_parsed(self):
+        result, parsed = self.validator._parse_validation_result('cols = {"Vuosi": "INTEGER"}')
+        self.assertFalse(parsed)
+        self.assertFalse(result["is_valid"])
+
+    def test_merge_defaults_missing_lists(self):
+        custom = {"is_valid": True, "syntax_errors": [], "field_errors": [],
+                  "warnings": ["No year constraint found"], "suggestions": []}
+        merged = self.validator._merge_validation_results({"is_valid": True}, custom)
+        self.assertTrue(merged["is_valid"])
+        self.assertEqual(merged["warnings"], ["No year constraint found"])
+        self.assertEqual(merged["syntax_errors"], [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+import pandas as pd
+from utils.visualization import FinancialDataVisualizer
+
+class TestFinancialDataVisualizer(unittest.TestCase):
+    def setUp(self):
+        self.visualizer = FinancialDataVisualizer()
+
+    def test_bar_chart_keeps_largest_categories(self):
+        n = FinancialDataVisualizer.MAX_BARS + 10
+        df = pd.DataFrame({'Hallinnonala': [f"branch {i}" for i in range(n)], 'amount': np.arange(n, dtype=float)})
+        fig = self.visualizer.create_visualization(df, 'Budget', 'bar')
+
+        bar = fig.data[0]
+        self.assertEqual(len(bar.x), FinancialDataVisualizer.MAX_BARS)
+        self.assertEqual(bar.y[0], n - 1)
+        self.assertNotIn("branch 0", list(bar.x))
+        self.assertEqual([a.text for a in fig.layout.annotations], [f"Showing top {FinancialDataVisualizer.MAX_BARS} of {n}"])
+
+    def test_small_bar_chart_not_annotated(self):
+        df = pd.DataFrame({'Hallinnonala': ['a', 'b', 'c'], 'amount': [1.0, 3.0, 2.0]})
+        fig = self.visualizer.create_visualization(df, 'Budget', 'bar')
+        self.assertEqual(list(fig.data[0].x), ['b', 'c', 'a'])
+        self.assertEqual(len(fig.layout.annotations), 0)
+
+    def test_pie_chart_folds_small_slices_into_other(self):
+        n = FinancialDataVisualizer.MAX_PIE_SLICES + 3
+        df = pd.DataFrame({'Hallinnonala': [f"branch {i}" for i in range(n)], 'amount': np.arange(1, n + 1, dtype=float)})
+        fig = self.visualizer.create_visualization(df, 'Budget', 'pie')
+
+        pie = fig.data[0]
+        self.assertEqual(len(pie.labels), FinancialDataVisualizer.MAX_PIE_SLICES + 1)
+        self.assertEqual(pie.labels[-1], "Other")
+        self.assertEqual(pie.values[-1], 1.0 + 2.0 + 3.0)
+        self.assertEqual(sum(pie.values), df['amount'].sum())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,10 @@
+import pandas as pd
+
+# Copy-on-write (always on from pandas 3): DataFrames derived from query results share
+# their buffers until modified. Change results with .assign()/.copy(), not chained assignment.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
 from .visualization import FinancialDataVisualizer
 from .auth import init_google_auth
 
@@ -6,9 +6,14 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Any, List, Optional
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Column name patterns used to locate budget and spending columns
+_BUDGET_RE = re.compile(r'budget|talousarvio', re.IGNORECASE)
+_SPEND_RE = re.compile(r'spending|kertymä', re.IGNORECASE)
+
 class FinancialAnalytics:
     """Class for performing financial analytics on government budget data."""
     
@@ -28,34 +33,42 @@ class FinancialAnalytics:
         """
         try:
             # Ensure we have required columns
-            required_cols = ['year', 'budget']
-            if not all(col in df.columns for col in required_cols):
+            required_cols = ('year', 'budget')
+            if not set(df.columns).issuperset(required_cols):
                 return {"error": "Missing required columns for trend analysis"}
             
-            # Calculate year-over-year changes
+            # Calculate year-over-year changes once on a float64 array of the budget
             df = df.sort_values('year')
-            df['budget_change'] = df['budget'].pct_change()
-            df['budget_change_abs'] = df['budget'].diff()
+            year_arr = df['year'].to_numpy()
+            budget = df['budget'].to_numpy(dtype=np.float64, na_value=np.nan)
+            prev = budget[:-1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pct = (budget[1:] - prev) / prev
+            valid = pct[~np.isnan(pct)]
             
             # Calculate compound annual growth rate (CAGR)
-            years = df['year'].max() - df['year'].min()
-            start_budget = df['budget'].iloc[0]
-            end_budget = df['budget'].iloc[-1]
+            years = year_arr[-1] - year_arr[0]
+            start_budget = float(budget[0])
+            end_budget = float(budget[-1])
             
             if years > 0 and start_budget > 0:
                 cagr = ((end_budget / start_budget) ** (1/years)) - 1
             else:
                 cagr = None
             
-            # Find significant changes
-            significant_changes = df[abs(df['budget_change']) > 0.1].copy()
+            # Find significant changes straight from the year-over-year array
+            mask = np.abs(pct) > 0.1
+            significant_changes = [
+                {'year': int(y), 'budget_change': float(p)}
+                for y, p in zip(year_arr[1:][mask], pct[mask])
+            ]
             
             analysis = {
                 "cagr": cagr * 100 if cagr is not None else None,
-                "average_annual_growth": df['budget_change'].mean() * 100 if 'budget_change' in df.columns else None,
+                "average_annual_growth": valid.mean() * 100 if valid.size else np.nan,
                 "total_change": ((end_budget - start_budget) / start_budget) * 100 if start_budget > 0 else None,
-                "significant_changes": significant_changes[['year', 'budget_change']].to_dict('records'),
-                "volatility": df['budget_change'].std() * 100 if 'budget_change' in df.columns else None
+                "significant_changes": significant_changes,
+                "volatility": valid.std(ddof=1) * 100 if valid.size > 1 else np.nan
             }
             
             return analysis
@@ -76,17 +89,18 @@ class FinancialAnalytics:
             Dict[str, Any]: Comparison results
         """
         try:
+            cols = set(df.columns)
+            
             # Filter for specific year if provided
-            if year and 'year' in df.columns:
+            if year and 'year' in cols:
                 df = df[df['year'] == year]
             
             # Group by ministry
-            if 'ministry' in df.columns:
-                ministry_spending = df.groupby('ministry')['spending'].sum().sort_values(ascending=False)
-            elif 'Hallinnonala' in df.columns:
-                ministry_spending = df.groupby('Hallinnonala')['Nettokertymä'].sum().sort_values(ascending=False)
-            else:
+            ministry_col = next((c for c in ('ministry', 'Hallinnonala') if c in cols), None)
+            if ministry_col is None:
                 return {"error": "No ministry column found"}
+            value_col = 'spending' if ministry_col == 'ministry' else 'Nettokertymä'
+            ministry_spending = df.groupby(ministry_col)[value_col].sum().sort_values(ascending=False)
             
             # Calculate percentages
             total_spending = ministry_spending.sum()
@@ -120,33 +134,60 @@ class FinancialAnalytics:
             Dict[str, Any]: Execution analysis
         """
         try:
-            # Check for required columns
-            budget_cols = [col for col in df.columns if 'budget' in col.lower() or 'talousarvio' in col.lower()]
-            spending_cols = [col for col in df.columns if 'spending' in col.lower() or 'kertymä' in col.lower()]
-            
-            if not budget_cols or not spending_cols:
+            # Find the first budget and spending columns in a single pass
+            budget_col = spending_col = None
+            for col in df.columns:
+                if budget_col is None and _BUDGET_RE.search(col):
+                    budget_col = col
+                if spending_col is None and _SPEND_RE.search(col):
+                    spending_col = col
+                if budget_col is not None and spending_col is not None:
+                    break
+            
+            if budget_col is None or spending_col is None:
                 return {"error": "Missing budget or spending columns"}
             
-            budget_col = budget_cols[0]
-            spending_col = spending_cols[0]
+            # Money stays float64: float32 keeps only ~7 significant digits
+            budget = df[budget_col].to_numpy(dtype=np.float64, na_value=np.nan)
+            spending = df[spending_col].to_numpy(dtype=np.float64, na_value=np.nan)
             
             # Calculate execution rate
-            df['execution_rate'] = (df[spending_col] / df[budget_col] * 100)
-            
-            # Find over and under-execution
-            over_execution = df[df['execution_rate'] > 100]
-            under_execution = df[df['execution_rate'] < 80]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                execution_rate = spending / budget * 100
+            df['execution_rate'] = execution_rate
             
             analysis = {
-                "overall_execution_rate": (df[spending_col].sum() / df[budget_col].sum() * 100),
-                "average_execution_rate": df['execution_rate'].mean(),
-                "over_executing_items": len(over_execution),
-                "under_executing_items": len(under_execution),
-                "execution_efficiency": 100 - abs(df['execution_rate'] - 100).mean()
+                "overall_execution_rate": np.nansum(spending) / np.nansum(budget) * 100,
+                "average_execution_rate": np.nanmean(execution_rate),
+                # Find over and under-execution
+                "over_executing_items": int(np.count_nonzero(execution_rate > 100)),
+                "under_executing_items": int(np.count_nonzero(execution_rate < 80)),
+                "execution_efficiency": 100 - np.nanmean(np.abs(execution_rate - 100))
             }
             
             return analysis
             
         except Exception as e:
             logger.error(f"Error in budget execution analysis: {str(e)}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+    
+    def full_analysis(self, df: pd.DataFrame, year: int = None) -> Dict[str, Any]:
+        """
+        Run trend, ministry and execution analyses over the same data.
+        
+        Args:
+            df (pd.DataFrame): Budget data
+            year (int): Specific year for the ministry comparison (optional)
+            
+        Returns:
+            Dict[str, Any]: Results keyed by 'trend', 'ministries' and 'execution'
+        """
+        # Work on a single shallow copy so the per-analysis helper columns
+        # (budget_change, execution_rate) never leak into the caller's frame
+        data = df.copy(deep=False)
+        
+        return {
+            "trend": self.analyze_budget_trend(data),
+            "ministries": self.compare_ministries(data, year),
+            "execution": self.budget_execution_analysis(data)
+        }
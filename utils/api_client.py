@@ -5,19 +5,9 @@ import pandas as pd
 from datetime import datetime
 import time
 import io
-from utils.secrets_manager import secrets_manager
-import google.generativeai as genai
 from utils.errors import APIError
 
-# Use centralized secrets manager for API key retrieval
-api_key = secrets_manager.get_api_key_ai_studio()
-if not hasattr(genai, '_configured'):
-        genai.configure(api_key=api_key)
-        genai._configured = True
-
-# Set up logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Handlers are configured once by the application (see utils.logger)
 logger = logging.getLogger(__name__)
 
 # Commenting out the original TutkihallintoaAPI class
@@ -43,7 +33,7 @@ class TutkihallintoaAPI:
         Returns:
             List[int]: List of available years
         """
-        logger.info("API DISABLED: Returning hardcoded list of years")
+        logger.debug("API DISABLED: Returning hardcoded list of years")
         return [2020, 2021, 2022, 2023, 2024]
     
     def make_request(self, params: Dict[str, Any]) -> Optional[pd.DataFrame]:
@@ -57,7 +47,7 @@ class TutkihallintoaAPI:
             None: Always returns None since API is disabled
         """
         logger.warning("API DISABLED: make_request() called but API is disabled")
-        logger.info(f"Would have requested with params: {params}")
+        logger.debug("Would have requested with params: %s", params)
         return None
     
     def get_monthly_data(self, year: int, month: int) -> Optional[pd.DataFrame]:
@@ -0,0 +1,57 @@
+"""
+Shared BigQuery client factories.
+"""
+
+from functools import lru_cache
+from typing import Optional
+import pandas as pd
+import pyarrow as pa
+from google.cloud import bigquery
+from google.cloud import bigquery_storage
+
+@lru_cache(maxsize=4)
+def get_bq_client(project_id: str) -> bigquery.Client:
+    """
+    Get the process-wide BigQuery client for a project.
+    
+    The client (and its credentials and HTTP session) is created once per
+    project and shared; callers must not close it.
+    
+    Args:
+        project_id (str): Google Cloud project ID
+        
+    Returns:
+        bigquery.Client: Shared BigQuery client
+    """
+    return bigquery.Client(project=project_id)
+
+@lru_cache(maxsize=1)
+def get_bqstorage_client() -> bigquery_storage.BigQueryReadClient:
+    """
+    Get the process-wide BigQuery Storage Read API client.
+    
+    Used to download query results as Arrow streams instead of paging them
+    through the REST tabledata API; shared like get_bq_client.
+    
+    Returns:
+        bigquery_storage.BigQueryReadClient: Shared Storage Read API client
+    """
+    return bigquery_storage.BigQueryReadClient()
+
+def arrow_dtype_mapper(arrow_type: pa.DataType) -> Optional[pd.ArrowDtype]:
+    """
+    types_mapper for Table.to_pandas when converting query results.
+    
+    Integer and floating columns become NumPy columns, so SQL NULLs arrive as
+    NaN (an integer column with NULLs becomes float64) and charts and
+    arithmetic treat them as before. Every other column stays Arrow-backed.
+    
+    Args:
+        arrow_type (pa.DataType): Arrow type of a result column
+        
+    Returns:
+        Optional[pd.ArrowDtype]: Arrow-backed dtype, or None for pyarrow's default NumPy conversion
+    """
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
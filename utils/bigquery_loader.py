@@ -1,15 +1,63 @@
+import io
 import logging
+from threading import RLock
+from cachetools import TTLCache
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from google.cloud import bigquery
 from google.api_core.exceptions import GoogleAPIError
 from typing import Optional
 from utils.bigquery_schema import get_bigquery_schema
+from utils.bigquery_client import get_bq_client
+from utils.query_cache import invalidate_query_caches
 
 logger = logging.getLogger(__name__)
 
+PARQUET_ROW_GROUP_SIZE = 500_000  # Rows per Parquet row group in a staged load
+
+# Arrow type written to Parquet for each BigQuery column type
+_ARROW_TYPES = {
+    'INTEGER': pa.int64(),
+    'INT64': pa.int64(),
+    'FLOAT': pa.float64(),
+    'FLOAT64': pa.float64(),
+    'NUMERIC': pa.decimal128(38, 9),
+    'BOOLEAN': pa.bool_(),
+    'BOOL': pa.bool_(),
+    'STRING': pa.string(),
+    'DATE': pa.date32(),
+    'TIMESTAMP': pa.timestamp('us', tz='UTC'),
+}
+
+def _arrow_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convert a prepared DataFrame to Arrow with the column types of the BigQuery schema.
+    
+    Columns the schema doesn't know keep the type Arrow infers for them.
+    
+    Args:
+        df (pd.DataFrame): Prepared DataFrame (or slice) to load
+        
+    Returns:
+        pa.Table: Table ready to be written as Parquet
+    """
+    bq_types = {field.name: field.field_type for field in get_bigquery_schema()}
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    schema = pa.schema([
+        pa.field(field.name, _ARROW_TYPES.get(bq_types.get(field.name), field.type))
+        for field in inferred
+    ])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
 class BigQueryLoader:
     """Class for loading Finnish government finance data into BigQuery."""
     
+    # Dataset/table metadata shared by all loaders, refreshed every 5 minutes
+    _dataset_cache = TTLCache(maxsize=128, ttl=300)
+    _table_cache = TTLCache(maxsize=1024, ttl=300)
+    _cache_lock = RLock()
+    
     def __init__(self, project_id: str, dataset_id: str, table_id: str):
         """
         Initialize BigQuery loader.
@@ -22,25 +70,69 @@ class BigQueryLoader:
         self.project_id = project_id
         self.dataset_id = dataset_id
         self.table_id = table_id
-        self.client = bigquery.Client(project=project_id)
+        self.client = get_bq_client(project_id)
         self.table_ref = f"{project_id}.{dataset_id}.{table_id}"
     
+    def get_dataset_cached(self, dataset_id: str) -> bigquery.Dataset:
+        """
+        Get dataset metadata, reusing a lookup made in the last 5 minutes.
+        
+        Args:
+            dataset_id (str): Dataset ID or fully qualified reference
+            
+        Returns:
+            bigquery.Dataset: Dataset metadata
+            
+        Raises:
+            google.api_core.exceptions.NotFound: If the dataset does not exist
+        """
+        with self._cache_lock:
+            if dataset_id in self._dataset_cache:
+                return self._dataset_cache[dataset_id]
+        dataset = self.client.get_dataset(dataset_id)
+        with self._cache_lock:
+            self._dataset_cache[dataset_id] = dataset
+        return dataset
+    
+    def get_table_cached(self, table_ref: str) -> bigquery.Table:
+        """
+        Get table metadata, reusing a lookup made in the last 5 minutes.
+        
+        Args:
+            table_ref (str): Fully qualified table reference
+            
+        Returns:
+            bigquery.Table: Table metadata
+            
+        Raises:
+            google.api_core.exceptions.NotFound: If the table does not exist
+        """
+        with self._cache_lock:
+            if table_ref in self._table_cache:
+                return self._table_cache[table_ref]
+        table = self.client.get_table(table_ref)
+        with self._cache_lock:
+            self._table_cache[table_ref] = table
+        return table
+    
     def create_dataset_if_not_exists(self) -> None:
         """Create the dataset if it doesn't exist."""
         try:
-            self.client.get_dataset(self.dataset_id)
+            self.get_dataset_cached(self.dataset_id)
             logger.info(f"Dataset {self.dataset_id} already exists")
         except Exception:
             # Dataset does not exist, create it
             dataset = bigquery.Dataset(f"{self.project_id}.{self.dataset_id}")
             dataset.location = "EU"  # Set to appropriate location for Finnish data
             dataset = self.client.create_dataset(dataset)
+            with self._cache_lock:
+                self._dataset_cache[self.dataset_id] = dataset
             logger.info(f"Dataset {self.dataset_id} created")
     
     def create_table_if_not_exists(self) -> None:
         """Create the table if it doesn't exist with the appropriate schema."""
         try:
-            self.client.get_table(self.table_ref)
+            self.get_table_cached(self.table_ref)
             logger.info(f"Table {self.table_id} already exists")
         except Exception:
             # Table does not exist, create it
@@ -57,15 +149,49 @@ class BigQueryLoader:
             table.clustering_fields = ["Ha_Tunnus", "Momentti_TunnusP"]
             
             table = self.client.create_table(table)
+            with self._cache_lock:
+                self._table_cache[self.table_ref] = table
             logger.info(f"Table {self.table_id} created with schema")
     
-    def load_dataframe(self, df: pd.DataFrame, write_disposition: str = "WRITE_APPEND") -> Optional[str]:
+    def _load_parquet(self, df: pd.DataFrame, write_disposition: str, row_group_size: int) -> str:
+        """
+        Stage a DataFrame as one Parquet file and run a single load job for it.
+        
+        Large frames are written as several row groups, which BigQuery reads in
+        parallel, while the load itself stays one atomic job.
+        
+        Args:
+            df (pd.DataFrame): Prepared DataFrame to load
+            write_disposition (str): BigQuery write disposition
+            row_group_size (int): Maximum number of rows per Parquet row group
+            
+        Returns:
+            str: Job ID of the completed load job
+        """
+        # Stage the data as compressed Parquet in memory, typed as the table schema
+        buf = io.BytesIO()
+        pq.write_table(_arrow_table(df), buf, compression='snappy', row_group_size=row_group_size)
+        buf.seek(0)
+        
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            schema=get_bigquery_schema(),
+            write_disposition=write_disposition
+        )
+        
+        job = self.client.load_table_from_file(buf, self.table_ref, job_config=job_config)
+        job.result()  # Wait for the job to complete
+        return job.job_id
+    
+    def load_dataframe(self, df: pd.DataFrame, write_disposition: str = "WRITE_APPEND",
+                       row_group_size: int = PARQUET_ROW_GROUP_SIZE) -> Optional[str]:
         """
-        Load a DataFrame into BigQuery.
+        Load a DataFrame into BigQuery in a single load job.
         
         Args:
             df (pd.DataFrame): DataFrame to load
             write_disposition (str): BigQuery write disposition (WRITE_APPEND, WRITE_TRUNCATE, or WRITE_EMPTY)
+            row_group_size (int): Maximum number of rows per Parquet row group
             
         Returns:
             Optional[str]: Job ID if successful, None if failed
@@ -76,34 +202,23 @@ class BigQueryLoader:
             # if 'Vuosi' in df.columns and 'Kk' in df.columns:
             #     df['YearMonth'] = pd.to_datetime(df['Vuosi'].astype(str) + '-' + df['Kk'].astype(str).str.zfill(2) + '-01')
             
-            # Convert numeric columns to strings where needed based on schema
-            df['Tililuokka_Tunnus'] = df['Tililuokka_Tunnus'].astype(str)
-            
-            # Add conversion for LkpT_Tunnus as well
-            df['LkpT_Tunnus'] = df['LkpT_Tunnus'].astype(str)
-            
-            # Handle type conversions for problematic columns
+            # Convert code columns that arrive as numbers to strings to match the schema
             type_conversion_columns = ['Tililuokka_Tunnus', 'LkpT_Tunnus', 'PaaluokkaOsasto_TunnusP', 
                                       'Luku_TunnusP', 'Momentti_TunnusP', 'TakpT_TunnusP', 
                                       'Ylatiliryhma_Tunnus', 'Tiliryhma_Tunnus', 'Tililaji_Tunnus']
-            for col in type_conversion_columns:
-                if col in df.columns and df[col].dtype != 'object':
-                    df[col] = df[col].fillna('').astype(str)
+            cols = [col for col in type_conversion_columns if col in df.columns and df[col].dtype != 'object']
+            if cols:
+                df[cols] = df[cols].fillna('').astype(str)
             
-            # Convert NaN values to None for proper NULL handling in BigQuery
-            df = df.where(pd.notnull(df), None)
-            
-            # Load the data
-            job_config = bigquery.LoadJobConfig(
-                schema=get_bigquery_schema(),
-                write_disposition=write_disposition
-            )
+            # No NaN -> None pass needed: Arrow writes NaN/NaT/NA as Parquet nulls
             
-            job = self.client.load_table_from_dataframe(df, self.table_ref, job_config=job_config)
-            job.result()  # Wait for the job to complete
+            # One job keeps the load atomic: a failure leaves the table as it was
+            job_id = self._load_parquet(df, write_disposition, row_group_size)
+            # Results cached before the load no longer match the table
+            invalidate_query_caches()
             
             logger.info(f"Loaded {len(df)} rows into {self.table_ref}")
-            return job.job_id
+            return job_id
             
         except GoogleAPIError as e:
             logger.error(f"BigQuery API error: {str(e)}")
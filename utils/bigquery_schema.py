@@ -1,9 +1,15 @@
+from functools import lru_cache
 from google.cloud import bigquery
 
 def get_bigquery_schema():
     """Define the BigQuery schema based on the API data structure."""
-    
-    return [
+    # SchemaFields are built once; callers get their own list to modify
+    return list(_schema_fields())
+
+@lru_cache(maxsize=1)
+def _schema_fields():
+    """Build the schema fields (cached)."""
+    return (
         # Date fields
         bigquery.SchemaField("Vuosi", "INTEGER", description="Year"),
         bigquery.SchemaField("Kk", "INTEGER", description="Month"),
@@ -49,4 +55,4 @@ def get_bigquery_schema():
         bigquery.SchemaField("NettoKertymaAikVuosSiirrt", "FLOAT", description="Net accumulation from previous years"),
         bigquery.SchemaField("Nettokertymä", "FLOAT", description="Net accumulation total"),
         bigquery.SchemaField("Loppusaldo", "FLOAT", description="Closing balance")
-    ]
\ No newline at end of file
+    )
\ No newline at end of file
@@ -3,11 +3,12 @@ Context caching system for repeated query patterns.
 Leverages Gemini 2.5 Pro's context caching feature.
 """
 
-import time
 import hashlib
-import json
+import orjson
 import logging
-from typing import Dict, Optional, Any
+import threading
+from typing import Optional
+from cachetools import TTLCache
 import google.generativeai as genai
 
 logger = logging.getLogger(__name__)
@@ -22,14 +23,15 @@ class CachedQuerySystem:
         Args:
             ttl (int): Cache time-to-live in seconds (default: 1 hour)
         """
-        self.context_cache: Dict[str, Dict[str, Any]] = {}
+        self.context_cache: TTLCache = TTLCache(maxsize=512, ttl=ttl)
         self.cache_ttl = ttl
+        self._lock = threading.RLock()
         self.model_name = "gemini-2.5-pro-preview-03-25"
         
     def get_schema_hash(self, schema: list) -> str:
         """Generate a hash for the database schema."""
-        schema_str = json.dumps(schema, sort_keys=True)
-        return hashlib.md5(schema_str.encode()).hexdigest()
+        schema_bytes = orjson.dumps(schema, option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(schema_bytes, digest_size=16).hexdigest()
     
     def get_cached_context(self, schema_hash: str) -> Optional[str]:
         """
@@ -41,10 +43,11 @@ class CachedQuerySystem:
         Returns:
             Optional[str]: Cached context if available and valid
         """
-        cached = self.context_cache.get(schema_hash)
-        if cached and cached["timestamp"] > time.time() - self.cache_ttl:
+        with self._lock:
+            cached = self.context_cache.get(schema_hash)
+        if cached is not None:
             logger.info(f"Cache hit for schema hash: {schema_hash}")
-            return cached["context"]
+            return cached
         
         logger.info(f"Cache miss for schema hash: {schema_hash}")
         return None
@@ -57,18 +60,17 @@ class CachedQuerySystem:
             schema_hash (str): Hash of the schema
             context (str): Context to cache
         """
-        self.context_cache[schema_hash] = {
-            "context": context,
-            "timestamp": time.time()
-        }
+        with self._lock:
+            self.context_cache[schema_hash] = context
         logger.info(f"Cached context for schema hash: {schema_hash}")
     
     def cleanup_stale_cache(self) -> None:
         """
         Remove stale cache entries.
+        
+        Expired entries are already evicted lazily on access; this just forces it.
         """
-        current_time = time.time()
-        stale_keys = [key for key, value in self.context_cache.items() if value["timestamp"] <= current_time - self.cache_ttl]
-        for key in stale_keys:
-            del self.context_cache[key]
-            logger.info(f"Removed stale cache entry for schema hash: {key}")
\ No newline at end of file
+        with self._lock:
+            expired = self.context_cache.expire()
+        for key, _ in expired:
+            logger.info(f"Removed stale cache entry for schema hash: {key}")
@@ -4,6 +4,7 @@ Centralized configuration management for the Finnish Government Budget Explorer.
 
 import os
 import json
+from functools import lru_cache
 from dotenv import load_dotenv
 from .auth import GoogleCloudAuth
 
@@ -18,6 +19,8 @@ REGION = os.getenv('REGION', 'europe-west4')
 MODEL_NAME = os.getenv('MODEL_NAME', 'gemini-1.5-pro')
 DEBUG_MODE = os.getenv('DEBUG_MODE', 'False').lower() == 'true'
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+ENABLE_PROMPT_CACHE = os.getenv('ENABLE_PROMPT_CACHE', 'False').lower() == 'true'
+ENABLE_SEMANTIC_CACHE = os.getenv('ENABLE_SEMANTIC_CACHE', 'False').lower() == 'true'
 
 # Add authentication check
 def check_authentication() -> bool:
@@ -37,19 +40,9 @@ def get_schema() -> list:
     schema_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'schema.json')
     
     try:
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            schema_data = json.load(f)
-        
-        # Convert BigQuery schema format to our expected format
-        schema = []
-        for field in schema_data:
-            schema.append({
-                "name": field["name"],
-                "type": field["type"],
-                "description": field.get("description", "")
-            })
-        
-        return schema
+        # Re-read the file only when it has changed on disk
+        schema = _load_schema(schema_path, os.path.getmtime(schema_path))
+        return [dict(field) for field in schema]
     except Exception as e:
         print(f"Error loading schema: {e}")
         # Fallback to basic schema if file not found
@@ -58,4 +51,20 @@ def get_schema() -> list:
             {"name": "Kk", "type": "INTEGER", "description": "Month"},
             {"name": "Ha_Tunnus", "type": "INTEGER", "description": "Administrative branch code"},
             {"name": "Hallinnonala", "type": "STRING", "description": "Administrative branch name"},
-        ]
\ No newline at end of file
+        ]
+
+@lru_cache(maxsize=1)
+def _load_schema(schema_path: str, mtime: float) -> tuple:
+    """Parse schema.json; cached per path and modification time."""
+    with open(schema_path, 'r', encoding='utf-8') as f:
+        schema_data = json.load(f)
+    
+    # Convert BigQuery schema format to our expected format
+    return tuple(
+        {
+            "name": field["name"],
+            "type": field["type"],
+            "description": field.get("description", "")
+        }
+        for field in schema_data
+    )
@@ -1,47 +1,59 @@
 import os
-from utils.config import PROJECT_ID, DATASET_ID, TABLE_ID
+import threading
+from utils.config import PROJECT_ID, DATASET_ID, TABLE_ID, ENABLE_PROMPT_CACHE, ENABLE_SEMANTIC_CACHE
+
+_REQUIRED_VARS = ('PROJECT_ID', 'DATASET_ID', 'TABLE_ID', 'REGION', 'MODEL_NAME')
 
 class ConfigService:
     """
     A service to manage configuration settings for the application.
     """
     _instance = None
+    _lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
         return cls._instance
 
     def __init__(self):
         """
         Initialize the ConfigService by loading environment variables.
         """
-        if not hasattr(self, 'initialized'):
-            self.initialized = True
-            self._load_env_variables()
+        if getattr(self, 'initialized', False):
+            return
+        with self._lock:
+            if not getattr(self, 'initialized', False):
+                self._load_env_variables()
+                self.initialized = True
 
     def _load_env_variables(self):
         """
         Load configuration from environment variables.
         """
-        self.project_id = PROJECT_ID
-        self.dataset_id = DATASET_ID
-        self.table_id = TABLE_ID
-        self.location = os.getenv('REGION')
-
-        # Load MODEL_NAME environment variable
-        self.model_name = os.getenv('MODEL_NAME')
-
-        # Ensure REGION is properly loaded
-        self.region = os.getenv('REGION')
-        if not self.region:
-            raise EnvironmentError("Missing required environment variable: REGION")
+        # Read every setting once; project/dataset/table carry defaults from utils.config
+        values = {
+            'PROJECT_ID': PROJECT_ID,
+            'DATASET_ID': DATASET_ID,
+            'TABLE_ID': TABLE_ID,
+            'REGION': os.environ.get('REGION'),
+            'MODEL_NAME': os.environ.get('MODEL_NAME'),
+        }
 
         # Validate required configurations
-        required_vars = ['PROJECT_ID', 'DATASET_ID', 'TABLE_ID', 'REGION', 'MODEL_NAME']
-        for var in required_vars:
-            if not getattr(self, var.lower()):
-                raise EnvironmentError(f"Missing required environment variable: {var}")
+        missing = [var for var in _REQUIRED_VARS if not values[var]]
+        if missing:
+            raise EnvironmentError(f"Missing required environment variable: {', '.join(missing)}")
+
+        self.project_id = values['PROJECT_ID']
+        self.dataset_id = values['DATASET_ID']
+        self.table_id = values['TABLE_ID']
+        self.location = self.region = values['REGION']
+        self.model_name = values['MODEL_NAME']
+        self.enable_prompt_cache = ENABLE_PROMPT_CACHE
+        self.enable_semantic_cache = ENABLE_SEMANTIC_CACHE
 
     def get_database_uri(self):
         """
@@ -5,32 +5,105 @@ Real data provider for connecting to BigQuery.
 import pandas as pd
 import logging
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 from google.api_core.exceptions import GoogleAPIError
 from typing import Optional, List
-from utils.secrets_manager import secrets_manager
-import google.generativeai as genai
 from schema_service import schema_service
 from utils.errors import BigQueryError
 from utils.config import PROJECT_ID, DATASET_ID, TABLE_ID
+from utils.bigquery_client import arrow_dtype_mapper, get_bq_client, get_bqstorage_client
+from utils.query_cache import register_cache
 import threading
 from contextlib import contextmanager
+from cachetools import TTLCache
 
 logger = logging.getLogger(__name__)
 
-# Use centralized secrets manager for API key retrieval
-api_key = secrets_manager.get_api_key_ai_studio()
-genai.configure(api_key=api_key)
+# Example queries keyed by query type; {table_ref} is filled in per provider
+_EXAMPLE_QUERIES = {
+    'military_budget_2022': """
+        SELECT 
+          SUM(`Alkuperäinen_talousarvio`) as original_budget,
+          SUM(`Voimassaoleva_talousarvio`) as current_budget
+        FROM 
+          `{table_ref}`
+        WHERE 
+          Vuosi = 2022 
+          AND Ha_Tunnus = 26
+    """,
+    'defense_quarterly_2022_2023': """
+        SELECT 
+          Vuosi as year,
+          CEIL(Kk/3) as quarter,
+          SUM(`Voimassaoleva_talousarvio`) as budget,
+          SUM(`Nettokertymä`) as spending
+        FROM 
+          `{table_ref}`
+        WHERE 
+          Vuosi IN (2022, 2023)
+          AND Ha_Tunnus = 26
+        GROUP BY 
+          year, quarter
+        ORDER BY 
+          year, quarter
+    """,
+    'education_budget_trend': """
+        SELECT 
+          Vuosi as year,
+          SUM(`Alkuperäinen_talousarvio`) as original_budget,
+          SUM(`Voimassaoleva_talousarvio`) as current_budget,
+          SUM(`Nettokertymä`) as spending
+        FROM 
+          `{table_ref}`
+        WHERE 
+          Vuosi BETWEEN 2020 AND 2023
+          AND Ha_Tunnus = 29
+        GROUP BY 
+          year
+        ORDER BY 
+          year
+    """,
+    'top_ministries_2023': """
+        SELECT 
+          Hallinnonala as ministry,
+          SUM(`Nettokertymä`) as spending
+        FROM 
+          `{table_ref}`
+        WHERE 
+          Vuosi = 2023
+        GROUP BY 
+          ministry
+        ORDER BY 
+          spending DESC
+        LIMIT 5
+    """
+}
 
 class DataProvider:
     """Provides real financial data from BigQuery."""
 
+    # Available years per table, refreshed hourly
+    _years_cache = TTLCache(maxsize=16, ttl=3600)
+    _cache_lock = threading.RLock()
+
     def __init__(self, project_id: str, dataset_id: str, table_id: str):
         """Initialize the data provider."""
         self.project_id = project_id
         self.dataset_id = dataset_id
         self.table_id = table_id
-        self.client = bigquery.Client(project=project_id)
+        self.client = get_bq_client(project_id)
         self.table_ref = f"{project_id}.{dataset_id}.{table_id}"
+        self._bqs_client = None  # Created on first query
+        self._example_queries = {
+            name: query.format(table_ref=self.table_ref) for name, query in _EXAMPLE_QUERIES.items()
+        }
+
+    @property
+    def bqstorage_client(self) -> bigquery_storage.BigQueryReadClient:
+        """BigQuery Storage Read API client used to download query results."""
+        if self._bqs_client is None:
+            self._bqs_client = get_bqstorage_client()
+        return self._bqs_client
 
     def execute_query(self, query: str) -> Optional[pd.DataFrame]:
         """
@@ -43,7 +116,7 @@ class DataProvider:
             Optional[pd.DataFrame]: Results DataFrame or None if query fails
         """
         try:
-            logger.info(f"Executing query: {query[:100]}...")
+            logger.info("Executing query: %.100s...", query)
 
             # Configure query job
             job_config = bigquery.QueryJobConfig(use_query_cache=True)
@@ -54,10 +127,13 @@ class DataProvider:
             # Get the results
             results = query_job.result()
 
-            # Convert to DataFrame
-            df = results.to_dataframe()
+            # Download via the Storage Read API as Arrow; numbers become NumPy columns (NULL -> NaN), the
+            # rest stay Arrow-backed; one block per column and freeing Arrow buffers avoids a second copy
+            arrow_table = results.to_arrow(bqstorage_client=self.bqstorage_client)
+            df = arrow_table.to_pandas(types_mapper=arrow_dtype_mapper, split_blocks=True, self_destruct=True)
+            del arrow_table
 
-            logger.info(f"Query returned {len(df)} rows")
+            logger.info("Query returned %d rows", len(df))
             return df
 
         except GoogleAPIError as e:
@@ -66,6 +142,16 @@ class DataProvider:
             logger.error(f"Error executing query: {str(e)}")
         return None
 
+    @classmethod
+    def refresh(cls) -> None:
+        """
+        Drop cached years so the next lookup reads from BigQuery again.
+
+        Registered with invalidate_query_caches, which BigQueryLoader calls after a load.
+        """
+        with cls._cache_lock:
+            cls._years_cache.clear()
+
     def generate_example_data(self, query_type: str) -> pd.DataFrame:
         """
         Generate example data for specific query types.
@@ -76,73 +162,21 @@ class DataProvider:
         Returns:
             pd.DataFrame: Example data
         """
-        queries = {
-            'military_budget_2022': """
-                SELECT 
-                  SUM(`Alkuperäinen_talousarvio`) as original_budget,
-                  SUM(`Voimassaoleva_talousarvio`) as current_budget
-                FROM 
-                  `{table_ref}`
-                WHERE 
-                  Vuosi = 2022 
-                  AND Ha_Tunnus = 26
-            """,
-            'defense_quarterly_2022_2023': """
-                SELECT 
-                  Vuosi as year,
-                  CEIL(Kk/3) as quarter,
-                  SUM(`Voimassaoleva_talousarvio`) as budget,
-                  SUM(`Nettokertymä`) as spending
-                FROM 
-                  `{table_ref}`
-                WHERE 
-                  Vuosi IN (2022, 2023)
-                  AND Ha_Tunnus = 26
-                GROUP BY 
-                  year, quarter
-                ORDER BY 
-                  year, quarter
-            """,
-            'education_budget_trend': """
-                SELECT 
-                  Vuosi as year,
-                  SUM(`Alkuperäinen_talousarvio`) as original_budget,
-                  SUM(`Voimassaoleva_talousarvio`) as current_budget,
-                  SUM(`Nettokertymä`) as spending
-                FROM 
-                  `{table_ref}`
-                WHERE 
-                  Vuosi BETWEEN 2020 AND 2023
-                  AND Ha_Tunnus = 29
-                GROUP BY 
-                  year
-                ORDER BY 
-                  year
-            """,
-            'top_ministries_2023': """
-                SELECT 
-                  Hallinnonala as ministry,
-                  SUM(`Nettokertymä`) as spending
-                FROM 
-                  `{table_ref}`
-                WHERE 
-                  Vuosi = 2023
-                GROUP BY 
-                  ministry
-                ORDER BY 
-                  spending DESC
-                LIMIT 5
-            """
-        }
 
-        query = queries.get(query_type)
+        query = self._example_queries.get(query_type)
         if query:
-            query = query.format(table_ref=self.table_ref)
-            return self.execute_query(query) or pd.DataFrame()
+            result = self.execute_query(query)
+            if result is not None:
+                return result
         return pd.DataFrame()
 
     def get_available_years(self) -> List[int]:
         """Get available years in the data."""
+        with self._cache_lock:
+            years = self._years_cache.get(self.table_ref)
+        if years is not None:
+            return list(years)
+
         query = f"""
         SELECT DISTINCT Vuosi 
         FROM `{self.table_ref}`
@@ -150,12 +184,17 @@ class DataProvider:
         """
         result = self.execute_query(query)
         if result is not None and not result.empty:
-            return result['Vuosi'].tolist()
+            years = result['Vuosi'].tolist()
+            with self._cache_lock:
+                self._years_cache[self.table_ref] = years
+            return list(years)
         return []
 
     def close(self):
-        """Close the BigQuery client."""
+        """Release the BigQuery clients (the shared client itself stays open for other users)."""
         if self.client:
-            self.client.close()
             self.client = None
-            logger.info("BigQuery client connection closed")
\ No newline at end of file
+            self._bqs_client = None
+            logger.info("BigQuery client connection released")
+
+register_cache(DataProvider.refresh)
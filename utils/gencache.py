@@ -0,0 +1,132 @@
+"""
+Structural cache mapping templated NL questions to parameterized SQL.
+
+Questions such as "military budget 2022" and "military budget 2023" share a
+skeleton ("<MINISTRY0> budget <YEAR0>"); once the SQL for one is known, the
+other is produced by substituting the slot values without an LLM call.
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Ministry keywords (English and Finnish) -> Ha_Tunnus administrative branch code
+MINISTRY_CODES: Dict[str, str] = {
+    'defense': '26', 'defence': '26', 'military': '26', 'puolustus': '26', 'puolustusministeriö': '26',
+    'education': '29', 'opetus': '29', 'opetusministeriö': '29', 'opetus- ja kulttuuriministeriö': '29',
+    'finance': '23', 'valtiovarainministeriö': '23',
+}
+
+_YEAR_RE = re.compile(r'\b(?:19|20)\d{2}\b')
+_MINISTRY_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(name) for name in sorted(MINISTRY_CODES, key=len, reverse=True)) + r')\b'
+)
+_SLOT_RE = re.compile(r'\{(YEAR\d+|MINISTRY\d+)\}')
+
+ADAPTED_EXPLANATION = "Query adapted from a structurally identical earlier question."
+
+class StructuralCache:
+    """Cache of (sql_template, explanation_template) keyed by question skeleton."""
+
+    def __init__(self, maxsize: int = 512, ttl: int = 3600):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of templates kept
+            ttl (int): Template time-to-live in seconds
+        """
+        self._templates = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def skeletonize(query: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Replace years and ministry names in a question with numbered slot tags.
+
+        Args:
+            query (str): Natural language question
+
+        Returns:
+            Tuple[str, Dict[str, str]]: Skeleton and slot name -> SQL literal
+                (the year itself, or the ministry's Ha_Tunnus code)
+        """
+        slots: Dict[str, str] = {}
+        counters = {'YEAR': 0, 'MINISTRY': 0}
+
+        def tag(kind: str, value: str) -> str:
+            name = f"{kind}{counters[kind]}"
+            counters[kind] += 1
+            slots[name] = value
+            return f"<{name}>"
+
+        skeleton = ' '.join(query.lower().split()).rstrip('?!. ')
+        skeleton = _YEAR_RE.sub(lambda m: tag('YEAR', m.group(0)), skeleton)
+        skeleton = _MINISTRY_RE.sub(lambda m: tag('MINISTRY', MINISTRY_CODES[m.group(1)]), skeleton)
+        return skeleton, slots
+
+    def lookup(self, query: str, context: Hashable = None) -> Optional[Tuple[str, str]]:
+        """
+        Build SQL for a question from a template learned on a structurally identical one.
+
+        Args:
+            query (str): Natural language question
+            context (Hashable): Anything else the SQL depends on (e.g. UI filters)
+
+        Returns:
+            Optional[Tuple[str, str]]: (sql, explanation), or None on a miss
+        """
+        skeleton, slots = self.skeletonize(query)
+        if not slots:
+            return None  # Nothing to parameterize; exact caches handle repeats
+
+        with self._lock:
+            template = self._templates.get((skeleton, context))
+        if template is None:
+            return None
+
+        fill = lambda m: slots[m.group(1)]
+        logger.debug("Structural cache hit for skeleton %r", skeleton)
+        return _SLOT_RE.sub(fill, template[0]), _SLOT_RE.sub(fill, template[1])
+
+    def store(self, query: str, sql: str, explanation: str, context: Hashable = None) -> bool:
+        """
+        Generalize generated SQL into a template for the question's skeleton.
+
+        A template is only stored when every slot value appears in the SQL and
+        no two slots share a value, so substitution is unambiguous.
+
+        Args:
+            query (str): Natural language question the SQL was generated for
+            sql (str): Generated SQL
+            explanation (str): Explanation returned with the SQL
+            context (Hashable): Anything else the SQL depends on (e.g. UI filters)
+
+        Returns:
+            bool: Whether a template was stored
+        """
+        skeleton, slots = self.skeletonize(query)
+        if not slots or len(set(slots.values())) != len(slots):
+            return False
+
+        # An explanation naming a ministry cannot be re-targeted by swapping a code
+        explanation_template = explanation
+        if any(name.startswith('MINISTRY') for name in slots) and _MINISTRY_RE.search(explanation.lower()):
+            explanation_template = ADAPTED_EXPLANATION
+
+        sql_template = sql
+        for name, value in slots.items():
+            # Whole literal only: not part of a longer number, identifier or decimal
+            literal = re.compile(rf'(?<![\w.]){re.escape(value)}(?!\w|\.\d)')
+            sql_template, count = literal.subn(f'{{{name}}}', sql_template)
+            if not count:
+                return False
+            explanation_template = literal.sub(f'{{{name}}}', explanation_template)
+
+        with self._lock:
+            self._templates[(skeleton, context)] = (sql_template, explanation_template)
+        return True
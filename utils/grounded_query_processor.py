@@ -4,35 +4,63 @@ Enhances queries with current Finnish government financial information.
 """
 
 import logging
-import json
 import re
-from typing import Dict, Any, Optional
+import threading
+import orjson
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 import google.generativeai as genai
-from utils.secrets_manager import secrets_manager
+from utils.secrets_manager import ensure_genai_configured
 from .schema_service import schema_service
 
 logger = logging.getLogger(__name__)
 
-# Initialize the Generative AI API with the API key from secrets_manager
-api_key = secrets_manager.get_api_key_ai_studio()
-if not hasattr(genai, '_configured'):
-    genai.configure(api_key=api_key)
-    genai._configured = True
+# Patterns used to pull structured data out of model responses
+_JSON_RE = re.compile(r'\{[\s\S]*\}')
+_SEARCH_RE = re.compile(r'(?:Title|Source):\s*([^\n]+)')
+_UPDATE_RE = re.compile(r'(?:Update|relevant).*?:\s*([^\n]+)', re.IGNORECASE)
+_SQL_PATTERNS = {
+    prefix: re.compile(prefix + r'.*?```sql\s*([\s\S]*?)```', re.IGNORECASE)
+    for prefix in ('Original', 'Enhanced')
+}
 
 class GroundedQueryProcessor:
     """Query processor with Google Search grounding capabilities."""
     
+    # GenerativeModel instances shared across processors, keyed by (model name, tools)
+    _model_cache: Dict[Tuple[str, Tuple[str, ...]], genai.GenerativeModel] = {}
+    _model_lock = threading.Lock()
+    
     def __init__(self, project_id: str, location: str = "europe-north1"):
         """Initialize the grounded query processor."""
         self.project_id = project_id
         self.location = location
         self.model_name = "gemini-exp-1206"
         
-        self.model = genai.GenerativeModel(
-            self.model_name,
-            tools=[{"google_search_retrieval": {}}]
-        )
+        ensure_genai_configured()
+        self.model = self._get_model(self.model_name, ("google_search_retrieval",))
+    
+    @classmethod
+    def _get_model(cls, model_name: str, tools: Tuple[str, ...]) -> genai.GenerativeModel:
+        """
+        Get a shared GenerativeModel so processors reuse its client transport.
+        
+        Args:
+            model_name (str): Gemini model name
+            tools (Tuple[str, ...]): Names of the tools to enable
+            
+        Returns:
+            genai.GenerativeModel: Cached model instance
+        """
+        key = (model_name, tools)
+        with cls._model_lock:
+            model = cls._model_cache.get(key)
+            if model is None:
+                model = cls._model_cache[key] = genai.GenerativeModel(
+                    model_name,
+                    tools=[{tool: {}} for tool in tools]
+                )
+        return model
     
     def process_with_grounding(self, query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -45,7 +73,88 @@ class GroundedQueryProcessor:
         Returns:
             Dict[str, Any]: Processed query with grounding information
         """
-        grounding_prompt = f"""
+        try:
+            response = self.model.generate_content(self._build_grounding_prompt(query))
+            return self._grounding_result(query, response.text)
+        except Exception as e:
+            return self._grounding_failure(query, e)
+    
+    async def process_with_grounding_async(self, query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Async variant of process_with_grounding that doesn't block the event loop.
+        
+        Args:
+            query (str): Natural language query
+            context (Dict, optional): Additional context for the query
+            
+        Returns:
+            Dict[str, Any]: Processed query with grounding information
+        """
+        try:
+            response = await self.model.generate_content_async(self._build_grounding_prompt(query))
+            return self._grounding_result(query, response.text)
+        except Exception as e:
+            return self._grounding_failure(query, e)
+    
+    def enrich_sql_query(self, sql: str, grounding_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Enrich SQL query with grounding information.
+        
+        Args:
+            sql (str): Original SQL query
+            grounding_info (Dict[str, Any]): Grounding information
+            
+        Returns:
+            Dict[str, Any]: Enriched query information
+        """
+        try:
+            response = self.model.generate_content(self._build_enrichment_prompt(sql, grounding_info))
+            return self._parse_enrichment_result(response.text)
+        except Exception as e:
+            return self._enrichment_failure(sql, e)
+    
+    async def enrich_sql_query_async(self, sql: str, grounding_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of enrich_sql_query that doesn't block the event loop.
+        
+        Args:
+            sql (str): Original SQL query
+            grounding_info (Dict[str, Any]): Grounding information
+            
+        Returns:
+            Dict[str, Any]: Enriched query information
+        """
+        try:
+            response = await self.model.generate_content_async(self._build_enrichment_prompt(sql, grounding_info))
+            return self._parse_enrichment_result(response.text)
+        except Exception as e:
+            return self._enrichment_failure(sql, e)
+    
+    async def process_and_enrich(self, query: str, sql: str) -> Dict[str, Any]:
+        """
+        Ground a query and enrich its SQL in one awaitable call.
+        
+        Enrichment needs the grounding result, so the two model calls run in
+        sequence; callers can gather several of these to overlap whole queries.
+        
+        Args:
+            query (str): Natural language query
+            sql (str): Tentative SQL for the query
+            
+        Returns:
+            Dict[str, Any]: {"grounding": ..., "enrichment": ...}
+        """
+        grounding = await self.process_with_grounding_async(query)
+        enrichment = await self.enrich_sql_query_async(sql, grounding)
+        return {"grounding": grounding, "enrichment": enrichment}
+
+    def process_query(self, query: str):
+        schema = schema_service.get_schema_dict()
+        # Use schema as needed...
+
+    def _build_grounding_prompt(self, query: str) -> str:
+        """Build the search grounding prompt for a query."""
+        return f"""
 You are analyzing a query about Finnish government finances. Use Google Search to find recent information about:
 
 1. Current Finnish government budget figures
@@ -77,43 +186,35 @@ Provide grounded context in this format:
   "confidence": number (0-1)
 }}
 """
+
+    def _grounding_result(self, query: str, response_text: str) -> Dict[str, Any]:
+        """Parse a grounding response and add query metadata."""
+        result = self._parse_grounding_result(response_text)
         
-        try:
-            response = self.model.generate_content(grounding_prompt)
-            result = self._parse_grounding_result(response.text)
-            
-            # Add metadata
-            result["query"] = query
-            result["grounded"] = True
-            result["timestamp"] = self._get_timestamp()
-            
-            logger.info(f"Query grounding completed with confidence: {result.get('confidence', 0)}")
-            return result
-            
-        except Exception as e:
-            logger.error(f"Query grounding failed: {str(e)}")
-            return {
-                "query": query,
-                "grounded": False,
-                "error": str(e),
-                "search_results": [],
-                "relevant_updates": [],
-                "suggested_query_modifications": [],
-                "confidence": 0.0
-            }
-    
-    def enrich_sql_query(self, sql: str, grounding_info: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Enrich SQL query with grounding information.
+        # Add metadata
+        result["query"] = query
+        result["grounded"] = True
+        result["timestamp"] = self._get_timestamp()
         
-        Args:
-            sql (str): Original SQL query
-            grounding_info (Dict[str, Any]): Grounding information
-            
-        Returns:
-            Dict[str, Any]: Enriched query information
-        """
-        enrichment_prompt = f"""
+        logger.info(f"Query grounding completed with confidence: {result.get('confidence', 0)}")
+        return result
+
+    def _grounding_failure(self, query: str, error: Exception) -> Dict[str, Any]:
+        """Build the ungrounded fallback result."""
+        logger.error(f"Query grounding failed: {str(error)}")
+        return {
+            "query": query,
+            "grounded": False,
+            "error": str(error),
+            "search_results": [],
+            "relevant_updates": [],
+            "suggested_query_modifications": [],
+            "confidence": 0.0
+        }
+
+    def _build_enrichment_prompt(self, sql: str, grounding_info: Dict[str, Any]) -> str:
+        """Build the SQL enrichment prompt."""
+        return f"""
 Based on the following grounding information, enhance this SQL query if needed:
 
 Original SQL:
@@ -122,7 +223,7 @@ Original SQL:
 ```
 
 Grounding Information:
-{json.dumps(grounding_info, indent=2)}
+{orjson.dumps(grounding_info, option=orjson.OPT_INDENT_2, default=str).decode()}
 
 Consider:
 
@@ -139,30 +240,24 @@ Return enhanced SQL and explanation:
 "rationale": string
 }}
 """
-        try:
-            response = self.model.generate_content(enrichment_prompt)
-            return self._parse_enrichment_result(response.text)
-            
-        except Exception as e:
-            logger.error(f"SQL enrichment failed: {str(e)}")
-            return {
-                "original_sql": sql,
-                "enhanced_sql": sql,
-                "changes_made": [],
-                "rationale": f"Enrichment failed: {str(e)}"
-            }
 
-    def process_query(self, query: str):
-        schema = schema_service.get_schema_dict()
-        # Use schema as needed...
+    def _enrichment_failure(self, sql: str, error: Exception) -> Dict[str, Any]:
+        """Build the fallback result that keeps the original SQL."""
+        logger.error(f"SQL enrichment failed: {str(error)}")
+        return {
+            "original_sql": sql,
+            "enhanced_sql": sql,
+            "changes_made": [],
+            "rationale": f"Enrichment failed: {str(error)}"
+        }
 
     def _parse_grounding_result(self, response_text: str) -> Dict[str, Any]:
         """Parse grounding result from model response."""
         try:
             # Extract JSON from response
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
+            json_match = _JSON_RE.search(response_text)
             if json_match:
-                return json.loads(json_match.group())
+                return orjson.loads(json_match.group())
             else:
                 # Fallback parsing
                 return self._extract_structured_data(response_text)
@@ -180,9 +275,9 @@ Return enhanced SQL and explanation:
         """Parse enrichment result from model response."""
         try:
             # Extract JSON from response
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
+            json_match = _JSON_RE.search(response_text)
             if json_match:
-                return json.loads(json_match.group())
+                return orjson.loads(json_match.group())
             else:
                 # Fallback to structured parsing
                 return {
@@ -212,14 +307,12 @@ Return enhanced SQL and explanation:
         }
         
         # Try to extract search results
-        search_pattern = r'(?:Title|Source):\s*([^\n]+)'
-        matches = re.findall(search_pattern, text)
+        matches = _SEARCH_RE.findall(text)
         if matches:
             result["search_results"] = [{"content": match} for match in matches]
         
         # Extract updates
-        update_pattern = r'(?:Update|relevant).*?:\s*([^\n]+)'
-        updates = re.findall(update_pattern, text, re.IGNORECASE)
+        updates = _UPDATE_RE.findall(text)
         if updates:
             result["relevant_updates"] = updates
         
@@ -227,8 +320,7 @@ Return enhanced SQL and explanation:
 
     def _extract_sql(self, text: str, prefix: str) -> str:
         """Extract SQL from text based on prefix."""
-        pattern = f'{prefix}.*?```sql\\s*([\\s\\S]*?)```'
-        match = re.search(pattern, text, re.IGNORECASE)
+        match = _SQL_PATTERNS[prefix].search(text)
         return match.group(1).strip() if match else ""
 
     def _get_timestamp(self) -> str:
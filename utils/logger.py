@@ -2,11 +2,123 @@
 Centralized logging configuration for the application.
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
 from datetime import datetime
 import os
-from typing import Optional
+from typing import List, Optional
+
+# Our formats never use thread/process fields; skip collecting them per record.
+# Caller lookup (logging._srcfile) stays on because %(filename)s:%(lineno)d is used.
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+# Shared formatter for console and file output
+_formatter = logging.Formatter(
+    '%(asctime)s | %(name)s | %(levelname)s | %(filename)s:%(lineno)d | %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# Log directories already created by this process
+_ensured_dirs = set()
+
+# Background listeners draining queued records to their target handlers
+_listeners: List[logging.handlers.QueueListener] = []
+
+# Set once the root logger has been configured by configure_app_logging
+_app_logging_configured = False
+
+# Records buffered in memory before a file write (errors are written immediately)
+LOG_BUFFER_RECORDS = 1024
+# Seconds a buffered record may wait before it is written anyway
+LOG_FLUSH_INTERVAL = 5.0
+
+class _PeriodicMemoryHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also flushes every `flush_interval` seconds from a daemon thread."""
+    
+    def __init__(self, capacity: int, flush_interval: float, flushLevel: int, target: logging.Handler):
+        super().__init__(capacity, flushLevel=flushLevel, target=target)
+        self._stop_flushing = threading.Event()
+        self._flush_interval = flush_interval
+        threading.Thread(target=self._flush_periodically, name='log-flush', daemon=True).start()
+    
+    def _flush_periodically(self) -> None:
+        """Write buffered records on a timer, so a quiet server doesn't hold them for hours."""
+        while not self._stop_flushing.wait(self._flush_interval):
+            self.flush()
+    
+    def close(self) -> None:
+        self._stop_flushing.set()
+        super().close()
+
+def buffered_file_handler(log_file: str, formatter: logging.Formatter,
+                          level: int = logging.NOTSET) -> logging.handlers.MemoryHandler:
+    """
+    Create a file handler that writes in batches instead of once per record.
+    
+    The buffer is written when it holds LOG_BUFFER_RECORDS records, when an
+    error is logged, and otherwise every LOG_FLUSH_INTERVAL seconds.
+    
+    Args:
+        log_file (str): Log file path
+        formatter (logging.Formatter): Formatter for the file output
+        level (int): Minimum level to write
+        
+    Returns:
+        logging.handlers.MemoryHandler: Buffering handler targeting the file
+    """
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(formatter)
+    buffered = _PeriodicMemoryHandler(
+        capacity=LOG_BUFFER_RECORDS,
+        flush_interval=LOG_FLUSH_INTERVAL,
+        flushLevel=logging.ERROR,
+        target=file_handler
+    )
+    buffered.setLevel(level)
+    return buffered
+
+def queued_handler(handler: logging.Handler) -> logging.handlers.QueueHandler:
+    """
+    Wrap a (blocking) handler so records are written from a background thread.
+    
+    The caller only enqueues the record; a QueueListener hands it to `handler`.
+    Listeners are flushed and stopped at interpreter exit.
+    
+    Args:
+        handler (logging.Handler): Handler doing the actual I/O
+        
+    Returns:
+        logging.handlers.QueueHandler: Handler to attach to loggers instead
+    """
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setLevel(handler.level)
+    return queue_handler
+
+@atexit.register
+def _stop_listeners() -> None:
+    """Flush queued records before the interpreter exits."""
+    while _listeners:
+        listener = _listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.flush()
+
+def _ensure_dir(log_dir: str) -> None:
+    """Create a log directory once per process, skipping the stat on later calls."""
+    if log_dir and log_dir not in _ensured_dirs:
+        os.makedirs(log_dir, exist_ok=True)
+        _ensured_dirs.add(log_dir)
 
 def setup_logger(name: str, log_file: Optional[str] = None, level: str = 'INFO') -> logging.Logger:
     """
@@ -30,54 +142,61 @@ def setup_logger(name: str, log_file: Optional[str] = None, level: str = 'INFO')
     log_level = getattr(logging, level.upper(), logging.INFO)
     logger.setLevel(log_level)
     
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s | %(name)s | %(levelname)s | %(filename)s:%(lineno)d | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(_formatter)
     logger.addHandler(console_handler)
     
     # File handler if log_file provided
     if log_file:
         # Create logs directory if it doesn't exist
-        log_dir = os.path.dirname(log_file)
-        if log_dir and not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+        _ensure_dir(os.path.dirname(log_file))
         
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(log_level)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        # Keep disk writes off the logging thread
+        logger.addHandler(queued_handler(buffered_file_handler(log_file, _formatter, log_level)))
     
     return logger
 
 def configure_app_logging():
-    """Configure application-wide logging."""
+    """
+    Configure application-wide logging on the root logger.
+    
+    Only the first call configures anything; Streamlit re-executes app.py on
+    every interaction, and later calls must not start a new log file.
+    """
+    global _app_logging_configured
+    app_logger = logging.getLogger('app')
+    if _app_logging_configured:
+        return app_logger
+    _app_logging_configured = True
+    
     # Create logs directory
     log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    _ensure_dir(log_dir)
     
     # Generate log file name with timestamp
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     log_file = os.path.join(log_dir, f"app_{timestamp}.log")
     
-    # Set up main application logger
-    app_logger = setup_logger('app', log_file, level='INFO')
+    # Configure only the root logger; module loggers (logging.getLogger(__name__))
+    # carry no handlers of their own and propagate here
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    
+    # Remove existing handlers
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(_formatter)
+    root_logger.addHandler(console_handler)
     
-    # Set up other component loggers
-    setup_logger('utils.api_client', log_file, level='INFO')
-    setup_logger('utils.bigquery_loader', log_file, level='INFO')
-    setup_logger('models.llm_interface', log_file, level='INFO')
-    setup_logger('utils.sql_executor', log_file, level='INFO')
+    # Keep disk writes off the logging thread
+    root_logger.addHandler(queued_handler(buffered_file_handler(log_file, _formatter)))
     
     # Log initialization message
     app_logger.info("Application logging initialized")
-    app_logger.info(f"Log file: {log_file}")
+    app_logger.info("Log file: %s", log_file)
     
-    return app_logger
\ No newline at end of file
+    return app_logger
@@ -5,6 +5,7 @@ Centralized logging configuration for the Finnish Government Budget Explorer.
 import logging
 import sys
 from utils.config import LOG_LEVEL, DEBUG_MODE
+from utils.logger import buffered_file_handler, queued_handler
 
 def configure_logging():
     """Configure application-wide logging."""
@@ -32,9 +33,9 @@ def configure_logging():
     
     # File handler for production
     if not DEBUG_MODE:
-        file_handler = logging.FileHandler('application.log')
-        file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        file_handler = buffered_file_handler('application.log', formatter)
+        # Keep disk writes off the logging thread
+        root_logger.addHandler(queued_handler(file_handler))
     
     # Set library loggers to WARNING
     for logger_name in ['urllib3', 'google', 'streamlit']:
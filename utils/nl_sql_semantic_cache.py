@@ -0,0 +1,129 @@
+"""
+Embedding-based cache matching paraphrased questions to previously generated SQL.
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from typing import Hashable, Optional, Tuple
+import numpy as np
+from vertexai.language_models import TextEmbeddingModel
+from .gencache import StructuralCache
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-004"
+SIMILARITY_THRESHOLD = 0.93  # Minimum cosine similarity for a hit
+MAX_ENTRIES = 1024  # Oldest entries are dropped beyond this
+
+@lru_cache(maxsize=1)
+def _embedding_model() -> TextEmbeddingModel:
+    """Load the embedding model on first use, after vertexai is initialized."""
+    return TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL)
+
+@lru_cache(maxsize=256)
+def _embed(query: str) -> np.ndarray:
+    """Embed and normalize a question; repeated strings are not re-embedded."""
+    vector = np.asarray(_embedding_model().get_embeddings([query])[0].values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+class SemanticSQLCache:
+    """
+    Nearest-neighbour cache of (sql, explanation) keyed on question embeddings.
+
+    Vectors are L2-normalized, so a single matrix-vector product gives the cosine
+    similarity to every cached question. A hit also requires the same context
+    (table, filters, available years) as the cached entry, and the same years and
+    ministries named in the question: "military budget 2022" and "military budget
+    2023" embed almost identically but need different SQL.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._vectors = None
+            cls._instance._context_ids = np.empty(0, dtype=np.int32)
+            cls._instance._answers = []  # (sql, explanation) per row of _vectors
+            cls._instance._contexts = {}  # context -> id stored in _context_ids; see _prune_contexts
+            cls._instance._next_context_id = 0
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    @staticmethod
+    def _entry_context(query: str, context: Hashable) -> Hashable:
+        """Context extended with the question's year and ministry slot values."""
+        _, slots = StructuralCache.skeletonize(query)
+        return context, tuple(slots.values())
+
+    def _prune_contexts(self) -> None:
+        """Forget contexts whose entries were all dropped; called with the lock held."""
+        live = set(self._context_ids.tolist())
+        self._contexts = {context: i for context, i in self._contexts.items() if i in live}
+
+    def lookup(self, query: str, context: Hashable) -> Optional[Tuple[str, str]]:
+        """
+        Find SQL generated for a question similar to `query` under the same context.
+
+        Args:
+            query (str): Normalized natural language question
+            context (Hashable): Everything else the generated SQL depends on
+
+        Returns:
+            Optional[Tuple[str, str]]: Cached (sql, explanation), or None on a miss
+        """
+        context = self._entry_context(query, context)
+        with self._lock:
+            if self._vectors is None or context not in self._contexts:
+                return None
+        try:
+            vector = _embed(query)
+        except Exception as e:
+            logger.warning(f"Embedding failed, skipping semantic cache: {str(e)}")
+            return None
+
+        with self._lock:
+            scores = self._vectors @ vector
+            scores[self._context_ids != self._contexts[context]] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < SIMILARITY_THRESHOLD:
+                return None
+            logger.debug("Semantic cache hit (similarity %.3f)", scores[best])
+            return self._answers[best]
+
+    def add(self, query: str, context: Hashable, sql: str, explanation: str) -> None:
+        """
+        Remember the SQL generated for a question.
+
+        Args:
+            query (str): Normalized natural language question
+            context (Hashable): Everything else the generated SQL depends on
+            sql (str): Generated (cleaned) SQL
+            explanation (str): Explanation returned with the SQL
+        """
+        try:
+            vector = _embed(query)
+        except Exception as e:
+            logger.warning(f"Embedding failed, not adding to semantic cache: {str(e)}")
+            return
+
+        with self._lock:
+            context = self._entry_context(query, context)
+            context_id = self._contexts.get(context)
+            if context_id is None:
+                context_id = self._contexts[context] = self._next_context_id
+                self._next_context_id += 1
+            if self._vectors is None:
+                self._vectors = vector[np.newaxis, :]
+            else:
+                self._vectors = np.vstack([self._vectors[-(MAX_ENTRIES - 1):], vector])
+                self._context_ids = self._context_ids[-(MAX_ENTRIES - 1):]
+                self._answers = self._answers[-(MAX_ENTRIES - 1):]
+            self._context_ids = np.append(self._context_ids, np.int32(context_id))
+            self._answers.append((sql, explanation))
+            # At most one context per entry is still referenced
+            if len(self._contexts) > MAX_ENTRIES:
+                self._prune_contexts()
+
+# Create a singleton instance
+semantic_sql_cache = SemanticSQLCache()
@@ -1,23 +1,72 @@
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Iterator, Optional, List, Tuple
 import re
+import threading
+from functools import lru_cache
+from cachetools import TTLCache
 import google.generativeai as genai
 from google.api_core.exceptions import GoogleAPIError
-from utils.prompt_templates import PromptTemplates
+from utils.prompt_templates import PromptBuilder, PromptTemplates
 from google.cloud import secretmanager
-from utils.secrets_manager import secrets_manager
+from utils.secrets_manager import secrets_manager, ensure_genai_configured
 import json
 from .schema_service import schema_service
 from .config_service import config
+from .vertex_cache_manager import vertex_cache_manager
+from .nl_sql_semantic_cache import semantic_sql_cache
 # from schema_service import schema_service
 from google.cloud import aiplatform
 import streamlit as st # << ADD THIS to access session_state
-from vertexai.generative_models import GenerativeModel
+from vertexai.generative_models import GenerativeModel, GenerationConfig
 
 logger = logging.getLogger(__name__)
 
+# Tail of a single-question prompt
+_QUESTION_TEMPLATE = """
+        Now, please convert the following question to a BigQuery SQL query adhering to ALL instructions:
+
+        Question: {question}
+        """
+
+# Fallback extraction from free-text replies. The SQL block is located with str.find
+# (see _extract_sql_and_explanation); whitespace around the SQL is optional.
+_SQL_FENCE_OPEN = "```sql"
+_SQL_FENCE_CLOSE = "```"
+_EXPLANATION_RE = re.compile(r"Explanation:\s+(.*?)(?:\n\n|$)", re.DOTALL)
+
+# Complete "sql" string value in a (possibly still streaming) JSON reply
+_SQL_FIELD_RE = re.compile(r'"sql"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+# Structured output returned by the model for each question
+_SQL_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sql": {"type": "string"},
+        "explanation": {"type": "string"}
+    },
+    "required": ["sql", "explanation"]
+}
+
+# Known column names containing Finnish characters that must be backticked in SQL
+_FINNISH_COLS = (
+    "Käytettävissä", "Lisätalousarvio", "Nettokertymä",
+    "Nettokertymä_ko_vuodelta", "Kirjanpitoyksikkö", "Loppusaldo",
+    "Alkuperäinen_talousarvio", "Voimassaoleva_talousarvio"
+)
+# One pass over the SQL for all columns: whole-word matches not already in backticks.
+# (?<![`\w]) - not preceded by a backtick or word character
+# (?![`\w]) - not followed by a backtick or word character
+# Longer names come first so a prefix (Nettokertymä) never shadows Nettokertymä_ko_vuodelta.
+_FINNISH_ALT = re.compile(
+    r'(?<![`\w])(' + '|'.join(re.escape(col) for col in sorted(_FINNISH_COLS, key=len, reverse=True)) + r')(?![`\w])'
+)
+
 class NLToSQLConverter:
     """Class for converting natural language queries to SQL for Finnish financial data."""
+
+    # Cleaned (sql, explanation) per question and prompt context, shared across reruns and sessions
+    _sql_cache = TTLCache(maxsize=256, ttl=3600)
+    _cache_lock = threading.RLock()
     
     def __init__(self, table_name: str):
         """
@@ -28,6 +77,52 @@ class NLToSQLConverter:
         self.model_name = "gemini-2.0-flash-001"  # Or your current chosen model
         self.table_name = table_name  # <-- CRITICAL: Use the table_name passed as an argument
         self.schema = schema_service.get_schema_dict()
+        self._schema_desc = "\n".join([
+            f"- `{field['name']}` ({field['type']}): {field.get('description', '')}"
+            for field in self.schema
+        ])  # Added backticks around field names for clarity
+
+        # Table references used by _clean_sql; none depend on the generated SQL.
+        # self.table_name is the FQTN from config.table_id; drop accidental backticks from it.
+        self._fqtn_clean = self.table_name.replace("`", "")  # e.g. "project.dataset.table"
+        self._short_table_name = self._fqtn_clean.split('.')[-1]  # e.g. "budget_transactions"
+        self._target_fqtn_bt = f"`{self._fqtn_clean}`"
+        self._llm_from_fragment = f"FROM `{self._short_table_name}`"
+        self._correct_from_clause = f"FROM {self._target_fqtn_bt}"
+
+        # Invariant prompt prefix, built once (see _build_static_prefix)
+        self._static_prefix = self._build_static_prefix()
+
+        # Initialize Vertex AI and the model once; the SDK keeps its channel for reuse.
+        # Pin the regional endpoint and gRPC so calls share one long-lived HTTP/2 channel.
+        aiplatform.init(
+            project=self.project_id,
+            location=self.location,
+            api_endpoint=f"{self.location}-aiplatform.googleapis.com",
+            api_transport="grpc"
+        )
+        self._model = GenerativeModel(self.model_name)
+        generation_params = {
+            "temperature": 0.2,
+            "top_p": 0.8,
+            "top_k": 40,
+            "max_output_tokens": 8192,
+            "response_mime_type": "application/json",
+        }
+        self._generation_config = GenerationConfig(response_schema=_SQL_RESPONSE_SCHEMA, **generation_params)
+        self._batch_generation_config = GenerationConfig(
+            response_schema={"type": "array", "items": _SQL_RESPONSE_SCHEMA}, **generation_params
+        )
+
+        # Explicit Vertex AI context cache holding the prefix (None when disabled or too small)
+        self._cache_resource_name = None
+        self._cached_model = None
+        if config.enable_prompt_cache:
+            self._cache_resource_name = vertex_cache_manager.get_or_create(
+                self.project_id, self.location, self.model_name, self._static_prefix
+            )
+            if self._cache_resource_name:
+                self._cached_model = vertex_cache_manager.model_for(self._cache_resource_name)
 
         # Fetch the API key from centralized secrets manager
         self.api_key = secrets_manager.get_api_key_ai_studio()
@@ -48,30 +143,20 @@ class NLToSQLConverter:
         if not self.table_name or not self.schema:
             return None, "Table information not set. Call set_table_info() first."
         
-        # Build the prompt for the LLM
-        prompt = self._build_prompt(natural_language_query)
+        # Same question with the same filters and years yields the same prompt
+        filters, available_years = self.session_context()
+        cache_key = self._sql_cache_key(natural_language_query, filters, available_years)
+        cached = self._cached_result(cache_key)
+        if cached is not None:
+            return cached
         
         try:
-            logger.debug(f"Using Vertex AI Model: {self.model_name}")
-
-            # Initialize Vertex AI
-            aiplatform.init(project=self.project_id, location=self.location)
-
-            # Use GenerativeModel from vertexai.generative_models
-            model = GenerativeModel(self.model_name)
-
-            # Define config as a dictionary
-            generation_config_dict = {
-                "temperature": 0.2,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 8192
-            }
+            model, prompt = self._model_and_prompt(natural_language_query, filters, available_years)
 
             # Generate the SQL using the correct method
             response = model.generate_content(
                 prompt,
-                generation_config=generation_config_dict
+                generation_config=self._generation_config
             )
 
             # Extract SQL and explanation from response
@@ -80,6 +165,7 @@ class NLToSQLConverter:
             # Clean and validate the SQL
             if sql_query:
                 sql_query = self._clean_sql(sql_query)
+                self._remember(cache_key, sql_query, explanation)
 
             return sql_query, explanation
 
@@ -92,43 +178,132 @@ class NLToSQLConverter:
         except Exception as e:
             logger.error(f"Unexpected error generating SQL: {str(e)}")
             return None, f"Error generating SQL: Unexpected error - {str(e)}"
-    
-    def _build_prompt(self, natural_language_query: str) -> str:
+
+    def generate_sql_stream(self, natural_language_query: str) -> Iterator[Tuple[Optional[str], str]]:
         """
-        Build the prompt for the LLM to generate SQL, including active filters and available years.
+        Generate SQL from a natural language query, streaming the model response.
+        
+        Yields (sql, "") as soon as the "sql" field of the JSON reply is complete, so
+        callers can start validating it while the explanation is still arriving, then
+        the final (sql, explanation) pair. Cache hits and errors yield only the final pair.
+        
+        Args:
+            natural_language_query (str): Natural language query
+            
+        Yields:
+            Tuple[Optional[str], str]: SQL query (cleaned) and explanation so far
         """
-        schema_desc = "\n".join([
-            f"- `{field['name']}` ({field['type']}): {field.get('description', '')}"
-            for field in self.schema
-        ])  # Added backticks around field names for clarity
-
-        # --- Retrieve active filters from st.session_state ---
-        active_filters = st.session_state.get('active_filters', {})
-        filter_instructions = []
-        year_start_filter = active_filters.get('year_start')
-        year_end_filter = active_filters.get('year_end')
-        if year_start_filter and year_end_filter:
-            if year_start_filter == year_end_filter:
-                filter_instructions.append(f"Data must be filtered for the year {year_start_filter}.")
-            else:
-                filter_instructions.append(f"Data must cover the year range from {year_start_filter} to {year_end_filter} inclusive.")
+        if not self.table_name or not self.schema:
+            yield None, "Table information not set. Call set_table_info() first."
+            return
+        
+        filters, available_years = self.session_context()
+        cache_key = self._sql_cache_key(natural_language_query, filters, available_years)
+        cached = self._cached_result(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        try:
+            model, prompt = self._model_and_prompt(natural_language_query, filters, available_years)
+            responses = model.generate_content(
+                prompt,
+                generation_config=self._generation_config,
+                stream=True
+            )
+            
+            response_text = ""
+            early_sql = None
+            for chunk in responses:
+                response_text += chunk.text
+                if early_sql is None:
+                    sql_match = _SQL_FIELD_RE.search(response_text)
+                    if sql_match:
+                        early_sql = self._clean_sql(json.loads(f'"{sql_match.group(1)}"').strip())
+                        yield early_sql, ""
+            
+            sql_query, explanation = self._extract_sql_and_explanation(response_text)
+            if sql_query:
+                sql_query = self._clean_sql(sql_query)
+                self._remember(cache_key, sql_query, explanation)
+            yield sql_query, explanation
 
-        filter_prompt_segment = ""
-        if filter_instructions:
-            filter_prompt_segment = "\nIMPORTANT: Strictly adhere to the following pre-defined filters from the user interface when generating the SQL, in addition to the user's question:\n"
-            for instruction in filter_instructions:
-                filter_prompt_segment += f"- {instruction}\n"
+        except GoogleAPIError as e:
+            logger.error(f"Google API error generating SQL: {str(e)}")
+            yield None, f"Error generating SQL: Google API Error - {str(e)}"
+        except Exception as e:
+            logger.error(f"Unexpected error generating SQL: {str(e)}")
+            yield None, f"Error generating SQL: Unexpected error - {str(e)}"
+
+    def _cached_result(self, cache_key: tuple) -> Optional[Tuple[str, str]]:
+        """Look up SQL for a cache key, falling back to the semantic cache when enabled."""
+        with self._cache_lock:
+            cached = self._sql_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("SQL cache hit")
+            return cached
+
+        # Paraphrases of an earlier question under the same context reuse its SQL
+        if config.enable_semantic_cache:
+            similar = semantic_sql_cache.lookup(cache_key[0], cache_key[1:])
+            if similar is not None:
+                result = (self._clean_sql(similar[0]), similar[1])
+                with self._cache_lock:
+                    self._sql_cache[cache_key] = result
+                return result
+        return None
+
+    def _remember(self, cache_key: tuple, sql_query: str, explanation: str) -> None:
+        """Store cleaned SQL in the SQL cache (and the semantic cache when enabled)."""
+        with self._cache_lock:
+            self._sql_cache[cache_key] = (sql_query, explanation)
+        if config.enable_semantic_cache:
+            semantic_sql_cache.add(cache_key[0], cache_key[1:], sql_query, explanation)
+
+    def _model_and_prompt(self, natural_language_query: str, filters: Dict[str, Any],
+                          available_years: Tuple[int, ...]) -> Tuple[GenerativeModel, str]:
+        """Pick the model to call and the matching prompt (suffix only when the prefix is cached)."""
+        logger.debug("Using Vertex AI Model: %s", self.model_name)
+
+        if self._cache_resource_name:
+            # Refresh the cache if it is about to expire; the prefix is served from it
+            resource_name = vertex_cache_manager.get_or_create(
+                self.project_id, self.location, self.model_name, self._static_prefix
+            )
+            if resource_name != self._cache_resource_name:
+                self._cached_model = vertex_cache_manager.model_for(resource_name) if resource_name else None
+                self._cache_resource_name = resource_name
 
-        # --- Add available years context ---
-        available_years = st.session_state.get('available_years', [])
-        available_years_info = ""
-        if available_years:
-            min_year = min(available_years)
-            max_year = max(available_years)
-            available_years_info = f"\nCONTEXT: The data is available ONLY for the years {min_year} through {max_year} (inclusive). Do not generate SQL for years outside this range unless the user explicitly asks for unavailable years (in which case, still query only the available range or return an appropriate empty result query)."
+        if self._cached_model is not None:
+            return self._cached_model, self._build_dynamic_suffix(natural_language_query, filters, available_years)
+        return self._model, self._build_prompt(natural_language_query, filters, available_years)
+    
+    @staticmethod
+    def session_context() -> Tuple[Dict[str, Any], Tuple[int, ...]]:
+        """Read the UI filters and available years from Streamlit session state once per request."""
+        filters = st.session_state.get('active_filters', {})
+        available_years = tuple(sorted(st.session_state.get('available_years', [])))
+        return filters, available_years
+
+    def _sql_cache_key(self, natural_language_query: str, filters: Dict[str, Any],
+                       available_years: Tuple[int, ...]) -> tuple:
+        """Key generated SQL on the normalized question plus everything else the prompt depends on."""
+        return (
+            natural_language_query.strip().lower(),
+            self.table_name,
+            filters.get('year_start'),
+            filters.get('year_end'),
+            available_years,
+        )
+
+    def _build_static_prefix(self) -> str:
+        """
+        Build the invariant part of the prompt (role, schema, instructions, examples).
 
-        # --- Modify Prompt Structure ---
-        prompt = f"""
+        It depends only on the table name and schema, so it is built once and kept
+        byte-identical across requests, letting Vertex AI implicit prefix caching hit.
+        """
+        return f"""
         You are an expert SQL generator for a financial analysis system using Google BigQuery. 
         Your task is to convert natural language questions about Finnish government finances into valid BigQuery SQL queries.
 
@@ -136,7 +311,7 @@ class NLToSQLConverter:
         Table Name (MUST be used fully qualified with backticks): `{self.table_name}` 
 
         Fields:
-        {schema_desc}
+        {self._schema_desc}
 
         Key information about the data:
         - The data contains Finnish government budget and accounting information.
@@ -145,15 +320,11 @@ class NLToSQLConverter:
         - Financial values include `Alkuperäinen_talousarvio`, `Voimassaoleva_talousarvio`, `Nettokertymä`.
         - The budget structure hierarchy uses `PaaluokkaOsasto`, `Luku`, `Momentti`.
 
-        {available_years_info} # << ADDED AVAILABLE YEARS CONTEXT
-
-        {filter_prompt_segment} # << INSERT UI FILTER INSTRUCTIONS HERE
-
         IMPORTANT INSTRUCTIONS:
         1. ALWAYS use the fully qualified table name WITH backticks: `{self.table_name}` in the FROM clause.
         2. Use ONLY columns specified in the schema above. Ensure column names with special characters (like Nettokertymä) are enclosed in backticks if needed (though BigQuery standard SQL often doesn't require it unless the name is a reserved keyword or has spaces/invalid chars). Assume standard SQL quoting rules apply.
-        3. Adhere strictly to the available data years ({min_year}-{max_year} if available) AND any active filters from the user interface. If the user asks for a year outside the available range (like 2020), generate a query that correctly returns no rows for that year (e.g., by still including it in the WHERE clause but knowing the data isn't there) or adjust the query to only use available years if appropriate for the question.
-        4. Generate ONLY the SQL query enclosed between ```sql and ``` tags, followed by a brief explanation starting with "Explanation:".
+        3. Adhere strictly to the available data years (given as CONTEXT after the examples, if known) AND any active filters from the user interface. If the user asks for a year outside the available range (like 2020), generate a query that correctly returns no rows for that year (e.g., by still including it in the WHERE clause but knowing the data isn't there) or adjust the query to only use available years if appropriate for the question.
+        4. Respond with a JSON object with two fields: "sql" (ONLY the SQL query, without ```sql fences) and "explanation" (a brief explanation of the query).
 
         Example SQL for the table `{self.table_name}`:
         Question: What was the military budget for 2023?
@@ -162,13 +333,168 @@ class NLToSQLConverter:
         SELECT SUM(`Voimassaoleva_talousarvio`) as current_budget FROM `{self.table_name}` WHERE Vuosi = 2023 AND Ha_Tunnus = '26'
         ```
         Explanation: Calculates the sum of the current budget for the Ministry of Defense (Ha_Tunnus '26') specifically for the year 2023.
+        {self._get_example_sql_queries()}
+"""
 
-        Now, please convert the following question to a BigQuery SQL query adhering to ALL instructions:
+    def _build_context_segment(self, filters: Optional[Dict[str, Any]] = None,
+                               available_years: Optional[Tuple[int, ...]] = None) -> str:
+        """
+        Build the per-request context of the prompt: available years and UI filters.
+        """
+        filters = filters or {}
+        return self._filter_segment(
+            filters.get('year_start'),
+            filters.get('year_end'),
+            tuple(sorted(available_years or ()))
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _filter_segment(year_start_filter, year_end_filter, available_years: Tuple[int, ...]) -> str:
+        """
+        Render the filter and available-years block.
+
+        Consecutive questions in a session almost always share these, so the
+        rendered block is cached on the small key.
+        """
+        filter_instructions = []
+        if year_start_filter and year_end_filter:
+            if year_start_filter == year_end_filter:
+                filter_instructions.append(f"Data must be filtered for the year {year_start_filter}.")
+            else:
+                filter_instructions.append(f"Data must cover the year range from {year_start_filter} to {year_end_filter} inclusive.")
+
+        filter_prompt_segment = ""
+        if filter_instructions:
+            filter_prompt_segment = "\nIMPORTANT: Strictly adhere to the following pre-defined filters from the user interface when generating the SQL, in addition to the user's question:\n"
+            filter_prompt_segment += "".join(f"- {instruction}\n" for instruction in filter_instructions)
+
+        # --- Add available years context ---
+        available_years_info = ""
+        if available_years:
+            min_year = available_years[0]
+            max_year = available_years[-1]
+            available_years_info = f"\nCONTEXT: The data is available ONLY for the years {min_year} through {max_year} (inclusive). Do not generate SQL for years outside this range unless the user explicitly asks for unavailable years (in which case, still query only the available range or return an appropriate empty result query)."
+
+        return f"""
+        {available_years_info}
+
+        {filter_prompt_segment}
+"""
+
+    def _build_dynamic_suffix(self, natural_language_query: str, filters: Optional[Dict[str, Any]] = None,
+                              available_years: Optional[Tuple[int, ...]] = None) -> str:
+        """
+        Build the per-request part of the prompt: available years, UI filters and the question.
+        """
+        return "".join((
+            self._build_context_segment(filters, available_years),
+            _QUESTION_TEMPLATE.format(question=natural_language_query)
+        ))
+
+    def _build_batch_suffix(self, natural_language_queries: List[str], filters: Optional[Dict[str, Any]] = None,
+                            available_years: Optional[Tuple[int, ...]] = None) -> str:
+        """
+        Build the per-request part of a prompt answering several questions at once.
+        """
+        questions = "\n".join(
+            f"        Question {i}: {query}" for i, query in enumerate(natural_language_queries, 1)
+        )
+        return self._build_context_segment(filters, available_years) + f"""
+        Now, please convert EACH of the following {len(natural_language_queries)} questions to a BigQuery SQL query adhering to ALL instructions.
+        Respond with a JSON array holding one {{"sql", "explanation"}} object per question, in the same order.
+
+{questions}
+        """
 
-        Question: {natural_language_query}
+    def generate_sql_batch(self, natural_language_queries: List[str]) -> List[Tuple[Optional[str], str]]:
         """
+        Generate SQL for several natural language queries with a single model call.
+
+        The static prefix is sent (and prefilled) once for the whole batch. Cached
+        questions are answered from the SQL cache and left out of the request.
 
-        return prompt
+        Args:
+            natural_language_queries (List[str]): Natural language queries
+
+        Returns:
+            List[Tuple[Optional[str], str]]: (SQL query, explanation) per input query, in order
+        """
+        if not self.table_name or not self.schema:
+            return [(None, "Table information not set. Call set_table_info() first.")] * len(natural_language_queries)
+
+        results: List[Optional[Tuple[Optional[str], str]]] = [None] * len(natural_language_queries)
+        filters, available_years = self.session_context()
+        pending = []
+        for i, query in enumerate(natural_language_queries):
+            key = self._sql_cache_key(query, filters, available_years)
+            cached = self._cached_result(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, query, key))
+
+        if len(pending) == 1:
+            index, query, _ = pending[0]
+            results[index] = self.generate_sql(query)
+        elif pending:
+            try:
+                # With a live context cache the prefix is already on the model side
+                if self._cached_model is not None:
+                    model, prefix = self._cached_model, ""
+                else:
+                    model, prefix = self._model, self._static_prefix
+                response = model.generate_content(
+                    prefix + self._build_batch_suffix([query for _, query, _ in pending], filters, available_years),
+                    generation_config=self._batch_generation_config
+                )
+                try:
+                    answers = json.loads(response.text)
+                except ValueError:
+                    answers = None
+                if not isinstance(answers, list):
+                    answers = []
+                if len(answers) != len(pending):
+                    logger.warning("Batch response had %d answers for %d questions", len(answers), len(pending))
+
+                for (index, _, key), answer in zip(pending, answers):
+                    sql_query, explanation = self._answer_fields(answer if isinstance(answer, dict) else {})
+                    if sql_query:
+                        sql_query = self._clean_sql(sql_query)
+                        self._remember(key, sql_query, explanation)
+                    results[index] = (sql_query, explanation)
+
+                # Questions the model skipped are retried one at a time
+                for index, query, _ in pending[len(answers):]:
+                    results[index] = self.generate_sql(query)
+
+            except GoogleAPIError as e:
+                logger.error(f"Google API error generating SQL batch: {str(e)}")
+                for index, _, _ in pending:
+                    results[index] = (None, f"Error generating SQL: Google API Error - {str(e)}")
+            except Exception as e:
+                logger.error(f"Unexpected error generating SQL batch: {str(e)}")
+                for index, _, _ in pending:
+                    results[index] = (None, f"Error generating SQL: {str(e)}")
+
+        return results
+
+    def _build_prompt(self, natural_language_query: str, filters: Optional[Dict[str, Any]] = None,
+                      available_years: Optional[Tuple[int, ...]] = None) -> str:
+        """
+        Build the prompt for the LLM to generate SQL, including active filters and available years.
+
+        Filters and years are passed in by the caller (see session_context), so
+        prompt building itself does not touch Streamlit.
+
+        The static prefix comes first and the per-request details last, so that
+        consecutive prompts share the longest possible prefix.
+        """
+        return "".join((
+            self._static_prefix,
+            self._build_context_segment(filters, available_years),
+            _QUESTION_TEMPLATE.format(question=natural_language_query)
+        ))
 
     def _get_example_sql_queries(self) -> str:
         """Helper method to provide example SQL queries for the prompt."""
@@ -218,54 +544,54 @@ class NLToSQLConverter:
         Returns:
             Tuple[Optional[str], str]: SQL query and explanation
         """
+        try:
+            data = json.loads(response_text)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            return self._answer_fields(data)
+
+        # Fallback for replies that ignored the JSON response format
         # Extract SQL between ```sql and ``` markers
-        sql_match = re.search(r"```sql\s+(.*?)\s+```", response_text, re.DOTALL)
-        sql_query = sql_match.group(1).strip() if sql_match else None
+        # Two linear scans for the fences; no regex backtracking over the reply
+        sql_query = None
+        start = response_text.find(_SQL_FENCE_OPEN)
+        if start != -1:
+            start += len(_SQL_FENCE_OPEN)
+            end = response_text.find(_SQL_FENCE_CLOSE, start)
+            if end != -1:
+                sql_query = response_text[start:end].strip()
         
         # Extract explanation
-        explanation_match = re.search(r"Explanation:\s+(.*?)(?:\n\n|$)", response_text, re.DOTALL)
+        explanation_match = _EXPLANATION_RE.search(response_text)
         explanation = explanation_match.group(1).strip() if explanation_match else "No explanation provided."
         
         return sql_query, explanation
+
+    @staticmethod
+    def _answer_fields(data: Dict[str, Any]) -> Tuple[Optional[str], str]:
+        """Read SQL and explanation from one structured-output answer."""
+        sql_query = (data.get("sql") or "").strip() or None
+        explanation = (data.get("explanation") or "").strip() or "No explanation provided."
+        return sql_query, explanation
     
     def _clean_sql(self, sql_query: str) -> str:
         """
         Clean and validate the SQL query, ensuring the correct table name.
         """
-        logger.info(f"--- Entering _clean_sql ---") # Using INFO for visibility
-        logger.info(f"Original SQL from LLM: '{sql_query}'")
+        logger.debug("Original SQL from LLM: '%s'", sql_query)
 
-        # self.table_name in NLToSQLConverter is the FQTN from config.table_id
-        # e.g., "massi-financial-analysis.finnish_finance_data.budget_transactions"
-        # Remove any accidental backticks from the configured FQTN itself for clean processing
-        fqtn_from_config_clean = self.table_name.replace("`", "") 
-
-        # Derive the short table name from your configured FQTN
-        short_table_name_from_config = fqtn_from_config_clean.split('.')[-1] # e.g., "budget_transactions"
-
-        # This is the target string we want in the SQL query
-        target_fqtn_with_backticks = f"`{fqtn_from_config_clean}`" # e.g., "`project.dataset.table`"
-
-        logger.info(f"Configured FQTN (self.table_name): '{self.table_name}'")
-        logger.info(f"Derived short table name from config: '{short_table_name_from_config}'")
-        logger.info(f"Target FQTN with backticks for replacement: '{target_fqtn_with_backticks}'")
+        # Already pointing at the configured table (cache hit, retry): nothing to rewrite
+        if self._target_fqtn_bt in sql_query:
+            return self._handle_finnish_characters(sql_query)
 
         # The LLM consistently generates the FROM clause with the short table name enclosed in backticks.
         # Example from logs: "FROM `budget_transactions`"
-
-        # Define the exact string fragment the LLM is producing for the FROM clause
-        llm_from_clause_fragment = f"FROM `{short_table_name_from_config}`" # e.g., "FROM `budget_transactions`"
-
-        # Define what it should be replaced with
-        correct_from_clause = f"FROM {target_fqtn_with_backticks}" # e.g., "FROM `project.dataset.table`"
-
-        logger.info(f"Attempting to replace LLM's table reference: '{llm_from_clause_fragment}' with '{correct_from_clause}'")
-
-        if llm_from_clause_fragment in sql_query:
-            sql_query = sql_query.replace(llm_from_clause_fragment, correct_from_clause)
-            logger.info(f"SQL after 'FROM' clause replacement: '{sql_query}'")
+        if self._llm_from_fragment in sql_query:
+            sql_query = sql_query.replace(self._llm_from_fragment, self._correct_from_clause)
+            logger.debug("SQL after 'FROM' clause replacement: '%s'", sql_query)
         else:
-            logger.info(f"Exact 'FROM' clause pattern '{llm_from_clause_fragment}' not found in SQL.")
+            logger.debug("Exact 'FROM' clause pattern '%s' not found in SQL.", self._llm_from_fragment)
             # You could add more fallbacks here if needed, e.g., for "JOIN `short_table_name`"
             # or if the LLM omits backticks around the short name.
             # For now, let's focus on the observed pattern.
@@ -273,7 +599,7 @@ class NLToSQLConverter:
         # Ensure other critical cleaning steps are still performed
         sql_query = self._handle_finnish_characters(sql_query) # Keep this
 
-        logger.info(f"--- FINAL Cleaned SQL for execution: {sql_query} ---")
+        logger.debug("Final cleaned SQL for execution: %s", sql_query)
         return sql_query
     
     def _handle_finnish_characters(self, sql_query: str) -> str:
@@ -281,31 +607,11 @@ class NLToSQLConverter:
         Ensures known Finnish column names are correctly backticked in the SQL query
         if they appear as whole words and are not already backticked.
         """
-        logger.info(f"--- Entering _handle_finnish_characters ---")
-        logger.info(f"SQL before Finnish column backticking: '{sql_query}'")
-
-        # Define your known column names that contain Finnish characters.
-        finnish_columns_to_ensure_backticked = [
-            "Käytettävissä", "Lisätalousarvio", "Nettokertymä",
-            "Nettokertymä_ko_vuodelta", "Kirjanpitoyksikkö", "Loppusaldo",
-            "Alkuperäinen_talousarvio", "Voimassaoleva_talousarvio"
-            # Add any other relevant column names from your schema if needed
-        ]
-
-        processed_sql = sql_query
-        for col_name in finnish_columns_to_ensure_backticked:
-            # This regex looks for the column name if it's NOT already enclosed in backticks
-            # AND is a whole word.
-            # (?<![`\w]) - Not preceded by a backtick or word character
-            # (?![`\w]) - Not followed by a backtick or word character
-            # re.escape(col_name) handles if col_name itself has special regex characters.
-            pattern_for_adding_backticks = r'(?<![`\w])(' + re.escape(col_name) + r')(?![`\w])'
-
-            if re.search(pattern_for_adding_backticks, processed_sql):
-                 processed_sql = re.sub(pattern_for_adding_backticks, r'`\1`', processed_sql)
-                 logger.info(f"Applied/Ensured backticks for column '{col_name}'.")
-
-        logger.info(f"SQL after Finnish column backticking: '{processed_sql}'")
+        processed_sql, count = _FINNISH_ALT.subn(r'`\1`', sql_query)
+        if count and logger.isEnabledFor(logging.DEBUG):
+            # Names are only collected when they will actually be logged
+            logger.debug("Backticked %d Finnish column reference(s): %s",
+                         count, ", ".join(sorted(set(_FINNISH_ALT.findall(sql_query)))))
         return processed_sql
 
 class EnhancedNLToSQLConverter:
@@ -316,12 +622,11 @@ class EnhancedNLToSQLConverter:
         self.model_name = "gemini-2.5-pro-preview-03-25"
         self.table_name = None
         self.schema = None
+        self._prompt_builder = None
         
         # Initialize generative AI
-        api_key = secrets_manager.get_api_key_ai_studio()
-        if not hasattr(genai, '_configured'):
-            genai.configure(api_key=api_key)
-            genai._configured = True
+        ensure_genai_configured()
+        self._gmodel = genai.GenerativeModel('gemini-2.0-flash')
         
         # Leverage structured output feature
         self.output_schema = {
@@ -339,6 +644,7 @@ class EnhancedNLToSQLConverter:
         """Set the table information for SQL generation."""
         self.table_name = table_name
         self.schema = schema
+        self._prompt_builder = PromptBuilder(schema_service.get_schema_dict(), table_name)
     
     def generate_sql(self, natural_language_query: str) -> Dict[str, Any]:
         """Generate SQL using structured output."""
@@ -351,10 +657,8 @@ class EnhancedNLToSQLConverter:
             }
         
         try:
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            
             # Use structured output feature
-            response = model.generate_content(
+            response = self._gmodel.generate_content(
                 [self._build_prompt(natural_language_query)],
                 generation_config={
                     "response_mime_type": "application/json",
@@ -390,13 +694,13 @@ class EnhancedNLToSQLConverter:
     
     def _build_prompt(self, natural_language_query: str) -> str:
         """Build the prompt for the LLM."""
-        # Use the enhanced prompt from PromptTemplates
-        return PromptTemplates.nl_to_sql_prompt(schema_service.get_schema_dict(), self.table_name, natural_language_query)
+        # Use the enhanced prompt; its static part was rendered in set_table_info
+        return self._prompt_builder.build(natural_language_query)
     
     def _clean_sql(self, sql_query: str) -> str:
         """Clean and validate the SQL query."""
-        # Ensure table name is properly formatted
-        sql_query = sql_query.replace("`" + self.table_name + "`", f"`{self.table_name}`")
+        # Ensure table name is properly formatted; the prompt examples use a `<TABLE>` placeholder
+        sql_query = PromptTemplates.resolve_table_placeholder(sql_query, self.table_name)
         
         # Ensure Finnish characters are handled properly
         sql_query = self._handle_finnish_characters(sql_query)
@@ -405,20 +709,5 @@ class EnhancedNLToSQLConverter:
     
     def _handle_finnish_characters(self, sql_query: str) -> str:
         """Ensure Finnish characters (ä, ö) are properly handled in column names."""
-        # List of columns with Finnish characters
-        finnish_columns = [
-            "Käytettävissä",
-            "Lisätalousarvio",
-            "Nettokertymä",
-            "Nettokertymä_ko_vuodelta",
-            "Kirjanpitoyksikkö",
-            "Loppusaldo",
-            "Alkuperäinen_talousarvio"
-        ]
-        
         # Make sure these columns are properly backticked
-        for col in finnish_columns:
-            # Replace instances not already backticked
-            sql_query = re.sub(r'(?<![`\w])' + col + r'(?![`\w])', '`' + col + '`', sql_query)
-        
-        return sql_query
\ No newline at end of file
+        return _FINNISH_ALT.sub(r'`\1`', sql_query)
\ No newline at end of file
@@ -2,36 +2,17 @@
 Prompt templates for LLM interactions.
 """
 
-from typing import Dict, Any, List
+import re
+from functools import lru_cache
+from typing import Dict, Any, Final, List, Tuple
 import pandas as pd
-import json
 import numpy as np
+import orjson
 from utils.schema_service import schema_service
 
-class NpEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, pd.Timestamp):
-            return obj.isoformat()
-        elif isinstance(obj, np.bool_):
-            return bool(obj)
-        return super(NpEncoder, self).default(obj)
-
-class PromptTemplates:
-    """Class for managing prompt templates for LLM interactions."""
-    
-    @staticmethod
-    def nl_to_sql_prompt(schema: List[Dict[str, Any]], table_name: str, query: str) -> str:
-        """
-        Generate a prompt for the NL to SQL conversion.
-        """
-        # Add special instructions for Finnish character handling
-        special_instructions = """
+# Static sections of the NL to SQL prompt. They do not depend on the table or the
+# query, so every NL to SQL prompt starts with the same bytes (provider prefix caching).
+_SPECIAL_INSTRUCTIONS: Final[str] = """
         IMPORTANT INSTRUCTIONS FOR HANDLING FINNISH CHARACTERS:
         
         1. Always use backticks (`) for column names with Finnish characters (ä, ö, å)
@@ -55,9 +36,12 @@ class PromptTemplates:
            - For "budget" use `Voimassaoleva_talousarvio`
            - For "spending" use `Nettokertymä`
         """
-        
-        # Enhanced examples with proper Finnish character handling
-        examples = """
+
+# Examples use a placeholder table; the prompt names the real table after them.
+# Models sometimes copy it into their SQL, with or without the backticks.
+_TABLE_PLACEHOLDER_RE = re.compile(r'`?<TABLE>`?')
+
+_EXAMPLES: Final[str] = """
         Example 1:
         Question: What was the military budget for 2022?
         SQL: 
@@ -66,7 +50,7 @@ class PromptTemplates:
           SUM(`Alkuperäinen_talousarvio`) as original_budget,
           SUM(`Voimassaoleva_talousarvio`) as current_budget
         FROM 
-          `{table_name}`
+          `<TABLE>`
         WHERE 
           Vuosi = 2022 
           AND Ha_Tunnus = 26
@@ -82,7 +66,7 @@ class PromptTemplates:
           SUM(`Voimassaoleva_talousarvio`) as current_budget,
           SUM(`Nettokertymä`) as actual_spending
         FROM 
-          `{table_name}`
+          `<TABLE>`
         WHERE 
           Vuosi BETWEEN 2020 AND 2024
           AND Ha_Tunnus = 26
@@ -91,15 +75,9 @@ class PromptTemplates:
         ORDER BY 
           year
         ```
-        """.format(table_name=table_name)
-        
-        # Rest of the prompt remains the same, but add special_instructions before examples
-        schema_str = "\n".join([
-            f"- {field['name']} ({field['type']}): {field.get('description', '')}"
-            for field in schema
-        ])
+        """
 
-        prompt = f"""
+_NL_TO_SQL_STATIC_PREFIX: Final[str] = f"""
         You are a Finnish government financial data SQL expert using Gemini's thinking mode.
 
         <thinking>
@@ -112,17 +90,13 @@ class PromptTemplates:
         6. Check if the query requires comparison or trend analysis
         </thinking>
 
-        Table: `{table_name}`
-
-        Schema:
-        {schema_str}
-
-        {special_instructions}
-
-        {examples}
+        {_SPECIAL_INSTRUCTIONS}
 
-        Query: {query}
+        The examples below use `<TABLE>` as a placeholder; always query the table given after them.
+        {_EXAMPLES}
+"""
 
+_NL_TO_SQL_OUTPUT_SPEC: Final[str] = """
         Generate structured output with these fields:
         1. "sql": The SQL query
         2. "explanation": Explanation in natural language  
@@ -130,16 +104,123 @@ class PromptTemplates:
         4. "assumptions": List of assumptions made (if any)
 
         Example output format:
-        {{
+        {
           "sql": "SELECT ...",
           "explanation": "This query calculates...",
           "confidence": 0.95,
           "assumptions": ["Assuming question refers to Ministry of Defense", "Using net accumulation as spending measure"]
-        }}
+        }
         """
+
+def _schema_key(schema: List[Dict[str, Any]]) -> Tuple[Tuple[str, str, str], ...]:
+    """Hashable (name, type, description) view of a schema, used as a cache key."""
+    return tuple((field['name'], field['type'], field.get('description', '')) for field in schema)
+
+@lru_cache(maxsize=4)
+def _format_schema(schema_key: Tuple[Tuple[str, str, str], ...]) -> str:
+    """Render schema fields as prompt lines; the schema is a singleton, so this is formatted once."""
+    return "\n".join([
+        f"- {name} ({field_type}): {description}"
+        for name, field_type, description in schema_key
+    ])
+
+def _orjson_default(obj):
+    """Serialize the values orjson can't handle natively (numpy is covered by OPT_SERIALIZE_NUMPY)."""
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    return str(obj)
+
+# numpy values are encoded in C; column names may be non-strings
+_ORJSON_PROMPT_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Results up to this many rows are sent to the explanation prompt in full
+RAW_ROWS_LIMIT = 20
+# Rows taken from each end of larger results
+EDGE_ROWS = 5
+
+class PromptBuilder:
+    """NL to SQL prompt builder bound to one table and schema."""
+    
+    def __init__(self, schema: List[Dict[str, Any]], table_name: str):
+        """
+        Render the static part of the prompt once.
+        
+        Args:
+            schema (List[Dict[str, Any]]): Table schema fields
+            table_name (str): Fully qualified table name
+        """
+        schema_tuple = _schema_key(schema)
+        self._static_prefix = PromptTemplates.nl_to_sql_static_prefix(table_name, schema_tuple)
+    
+    def build(self, query: str) -> str:
+        """
+        Build the full prompt for a query; only the short suffix is rendered per call.
+        """
+        return self._static_prefix + PromptTemplates.nl_to_sql_suffix(query)
+
+class PromptTemplates:
+    """Class for managing prompt templates for LLM interactions."""
+    
+    @staticmethod
+    def nl_to_sql_prompt(schema: List[Dict[str, Any]], table_name: str, query: str) -> str:
+        """
+        Generate a prompt for the NL to SQL conversion.
+        """
+        schema_tuple = _schema_key(schema)
+        return PromptTemplates.nl_to_sql_static_prefix(table_name, schema_tuple) + PromptTemplates.nl_to_sql_suffix(query)
+
+    @staticmethod
+    def resolve_table_placeholder(sql: str, table_name: str) -> str:
+        """
+        Replace the examples' `<TABLE>` placeholder in generated SQL with the real table.
+        
+        Args:
+            sql (str): SQL generated from a nl_to_sql prompt
+            table_name (str): Fully qualified table name the prompt was built for
+            
+        Returns:
+            str: SQL querying `table_name`
+        """
+        if '<TABLE>' not in sql:
+            return sql
+        return _TABLE_PLACEHOLDER_RE.sub(f"`{table_name}`", sql)
+
+    @staticmethod
+    @lru_cache(maxsize=4)
+    def nl_to_sql_static_prefix(table_name: str, schema_tuple: Tuple[Tuple[str, str, str], ...]) -> str:
+        """
+        Render the query-independent part of the NL to SQL prompt.
+        
+        The module-level static prefix comes first and is shared by all tables;
+        the table and schema follow. Cached per table and schema.
+        
+        Args:
+            table_name (str): Fully qualified table name
+            schema_tuple (tuple): (name, type, description) per schema field
+        """
+        schema_str = _format_schema(schema_tuple)
+
+        # Table-independent instructions first, then this table's details and the output spec
+        prompt = _NL_TO_SQL_STATIC_PREFIX + f"""
+        Table: `{table_name}`
+
+        Schema:
+        {schema_str}
+""" + _NL_TO_SQL_OUTPUT_SPEC
         
         return prompt
 
+    @staticmethod
+    def nl_to_sql_suffix(query: str) -> str:
+        """
+        Render the per-request tail of the NL to SQL prompt.
+        """
+        return f"""
+        Query: {query}
+        """
+
     @staticmethod
     def results_explanation_prompt(query: str, sql: str, df: pd.DataFrame, visualization_type: str) -> str:
         """
@@ -154,13 +235,19 @@ class PromptTemplates:
         Returns:
             str: Formatted prompt
         """
-        # Convert DataFrame to JSON for the prompt
-        df_sample = df.head(50)  # Limit to 50 rows to keep prompt size reasonable
-        try:
-            df_json = df_sample.to_json(orient='records', date_format='iso')
-        except:
-            # Fall back to a simpler format if JSON conversion fails
-            df_json = str(df_sample.to_dict(orient='records'))
+        # Small results go in whole; larger ones as first and last rows next to the stats
+        if len(df) <= RAW_ROWS_LIMIT:
+            df_sample = df
+            sample_label = f"all {len(df)} rows"
+        else:
+            df_sample = pd.concat([df.head(EDGE_ROWS), df.tail(EDGE_ROWS)])
+            sample_label = f"first {EDGE_ROWS} and last {EDGE_ROWS} of {len(df)} rows"
+        # Columns once plus row arrays: far fewer bytes (and tokens) than one object per row
+        df_json = orjson.dumps(
+            {"columns": df_sample.columns.tolist(), "data": df_sample.to_numpy(dtype=object).tolist()},
+            option=orjson.OPT_SERIALIZE_NUMPY,
+            default=_orjson_default,
+        ).decode()
         
         # Create a summary of the data shape
         data_summary = f"Data has {len(df)} rows and {len(df.columns)} columns: {', '.join(df.columns)}"
@@ -169,9 +256,19 @@ class PromptTemplates:
         numeric_summary = ""
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
         if numeric_cols:
-            numeric_summary = "Statistical summary of numeric columns:\n"
-            for col in numeric_cols:
-                numeric_summary += f"- {col}: min={df[col].min()}, max={df[col].max()}, mean={df[col].mean()}, sum={df[col].sum()}\n"
+            # One float64 block, reduced column-wise by numpy; NaNs (and NA) are skipped like pandas does
+            values = df[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+            counts = np.count_nonzero(~np.isnan(values), axis=0)
+            sums = np.nansum(values, axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts
+            stats = pd.DataFrame({
+                'min': np.fmin.reduce(values, axis=0, initial=np.nan),
+                'max': np.fmax.reduce(values, axis=0, initial=np.nan),
+                'mean': means,
+                'sum': sums,
+            }, index=numeric_cols)
+            numeric_summary = "Statistical summary of numeric columns (CSV):\n" + stats.to_csv(index_label='column')
         
         # Build the complete prompt
         prompt = f"""
@@ -188,7 +285,7 @@ class PromptTemplates:
         
         {numeric_summary}
         
-        Data (sample of {len(df_sample)} rows):
+        Data ({sample_label}; format: "columns" names + "data" row arrays):
         {df_json}
         
         Visualization type chosen: {visualization_type}
@@ -222,8 +319,8 @@ class PromptTemplates:
         df_info = {
             "rows": len(df),
             "columns": list(df.columns),
-            "column_types": {col: str(df[col].dtype) for col in df.columns},
-            "sample_values": {col: df[col].iloc[0] if len(df) > 0 else None for col in df.columns}
+            "column_types": df.dtypes.astype(str).to_dict(),
+            "sample_values": (df.head(1).to_dict(orient='records')[0] if len(df) else {col: None for col in df.columns})
         }
         
         # Build the complete prompt
@@ -233,7 +330,7 @@ class PromptTemplates:
         Original question: {query}
         
         Dataset information:
-        {json.dumps(df_info, indent=2, cls=NpEncoder)}
+        {orjson.dumps(df_info, option=_ORJSON_PROMPT_OPTIONS, default=_orjson_default).decode()}
         
         Available visualization types:
         - time_line: Line chart for time series with a single metric
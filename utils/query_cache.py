@@ -0,0 +1,57 @@
+"""
+Shared rules for in-process caches of BigQuery query results.
+
+Result and metadata caches register a clear callback here; code that changes
+table contents (BigQueryLoader) calls invalidate_query_caches afterwards.
+"""
+
+import inspect
+import re
+import threading
+import weakref
+from typing import Callable, List
+
+# Queries whose results change between runs are never served from a cache
+_NONDETERMINISTIC_RE = re.compile(
+    r'\bCURRENT_(?:TIMESTAMP|DATETIME|DATE|TIME)\b|\b(?:RAND|GENERATE_UUID|SESSION_USER)\s*\(',
+    re.IGNORECASE
+)
+
+# Weak references to the registered clear callbacks, so per-instance caches don't outlive their owners
+_invalidation_hooks: List[Callable[[], Callable[[], None]]] = []
+_hooks_lock = threading.Lock()
+
+def is_deterministic_sql(sql_query: str) -> bool:
+    """
+    Whether a query returns the same rows on every run over unchanged tables.
+
+    Args:
+        sql_query (str): SQL query
+
+    Returns:
+        bool: False if the query reads the clock, random numbers or the session user
+    """
+    return _NONDETERMINISTIC_RE.search(sql_query) is None
+
+def register_cache(clear: Callable[[], None]) -> None:
+    """
+    Register a callback that empties a cache of query results or table metadata.
+
+    Bound methods are held weakly: an instance's registration ends when the
+    instance is garbage collected.
+
+    Args:
+        clear (Callable[[], None]): Callback run by invalidate_query_caches
+    """
+    ref = weakref.WeakMethod(clear) if inspect.ismethod(clear) else (lambda: clear)
+    with _hooks_lock:
+        _invalidation_hooks.append(ref)
+
+def invalidate_query_caches() -> None:
+    """Empty every registered cache; call after a table's contents change."""
+    with _hooks_lock:
+        hooks = [ref() for ref in _invalidation_hooks]
+        _invalidation_hooks[:] = [ref for ref, hook in zip(_invalidation_hooks, hooks) if hook is not None]
+    for hook in hooks:
+        if hook is not None:
+            hook()
@@ -1,25 +1,41 @@
+import asyncio
 import logging
+from typing import Any, Dict, List
 from .nl_to_sql import NLToSQLConverter
 from .real_data_provider import RealDataProvider
 from .bigquery_schema import get_bigquery_schema
+from .gencache import StructuralCache
 
 schema_service = get_bigquery_schema()
 
 logger = logging.getLogger(__name__)
 
 class QueryHandler:
+    # SQL templates learned from generated queries, shared by all handlers
+    _structural_cache = StructuralCache()
+
     def __init__(self, config):
-        self.nl_converter = NLToSQLConverter()
-        self.data_provider = RealDataProvider(project_id="massi-financial-analysis", 
-                                              dataset_id="finnish_finance_data", 
-                                              table_id="budget_transactions")
+        self.nl_converter = NLToSQLConverter(
+            table_name=f"{config.project_id}.{config.dataset_id}.{config.table_id}"
+        )
+        self.data_provider = RealDataProvider(project_id=config.project_id, 
+                                              dataset_id=config.dataset_id, 
+                                              table_id=config.table_id)
         self.schema = get_bigquery_schema()
     
     def process_query(self, query: str):
         """Process a natural language query end-to-end."""
         try:
-            # Convert to SQL
-            sql, explanation = self.nl_converter.generate_sql(query)
+            # Questions differing only in year/ministry reuse a learned SQL template
+            context = self._structural_context()
+            cached = self._structural_cache.lookup(query, context)
+            if cached is not None:
+                sql, explanation = cached
+            else:
+                # Convert to SQL
+                sql, explanation = self.nl_converter.generate_sql(query)
+                if sql:
+                    self._structural_cache.store(query, sql, explanation, context)
             
             # Execute SQL
             result = self.data_provider.execute_query(sql)
@@ -31,4 +47,49 @@ class QueryHandler:
             }
         except Exception as e:
             logger.error(f"Query processing failed: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
+
+    async def process_queries(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Process several natural language queries, e.g. for the panels of a dashboard.
+        
+        SQL for all queries not answered by the structural cache is generated in one
+        batched model request; the resulting BigQuery jobs then run concurrently.
+        
+        Args:
+            queries (List[str]): Natural language queries
+            
+        Returns:
+            List[Dict[str, Any]]: One {'sql', 'explanation', 'result'} dict per query, in order
+        """
+        try:
+            context = self._structural_context()
+            generated = [self._structural_cache.lookup(query, context) for query in queries]
+            
+            # Batch generation reads Streamlit session state, so it stays on this thread
+            pending = [i for i, pair in enumerate(generated) if pair is None]
+            if pending:
+                batch = self.nl_converter.generate_sql_batch([queries[i] for i in pending])
+                for i, (sql, explanation) in zip(pending, batch):
+                    generated[i] = (sql, explanation)
+                    if sql:
+                        self._structural_cache.store(queries[i], sql, explanation, context)
+            
+            # Run the queries concurrently; each execute_query blocks on its own job
+            results = await asyncio.gather(*(
+                asyncio.to_thread(self.data_provider.execute_query, sql) if sql else asyncio.sleep(0)
+                for sql, _ in generated
+            ))
+            
+            return [
+                {'sql': sql, 'explanation': explanation, 'result': result}
+                for (sql, explanation), result in zip(generated, results)
+            ]
+        except Exception as e:
+            logger.error(f"Batch query processing failed: {str(e)}", exc_info=True)
+            raise
+
+    def _structural_context(self) -> tuple:
+        """UI filters and available years, which the generated SQL also depends on."""
+        filters, available_years = self.nl_converter.session_context()
+        return (filters.get('year_start'), filters.get('year_end'), available_years)
\ No newline at end of file
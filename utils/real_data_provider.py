@@ -1,12 +1,45 @@
+import hashlib
 import logging
+import re
+import threading
+import time
 import pandas as pd
+from cachetools import TTLCache
 from google.cloud import bigquery
 from google.api_core.exceptions import GoogleAPIError
 from typing import Optional
+from utils.bigquery_client import arrow_dtype_mapper, get_bq_client, get_bqstorage_client
+from utils.query_cache import is_deterministic_sql, register_cache
 
 logger = logging.getLogger(__name__)
 
+# Column names with Finnish characters that must be backticked in SQL
+FINNISH_COLUMNS = [
+    "Nettokertymä",
+    "Lisätalousarvio",
+    "Käytettävissä",
+    "Kirjanpitoyksikkö",
+    "Loppusaldo"
+]
+
+# Matches any of the columns as a whole identifier that isn't already backticked
+_IDENT_RE = re.compile(
+    r'(?<![`\w])(' + '|'.join(map(re.escape, FINNISH_COLUMNS)) + r')(?![`\w])'
+)
+
+# Larger results are not kept in the in-process result cache
+MAX_CACHED_ROWS = 100_000
+
 class RealDataProvider:
+    # Distinct years per table, keyed by (table_ref, day bucket) so entries
+    # expire after a day; shared across instances within the process
+    _years_cache = {}
+    # Table schema per table_ref for the life of the process; see invalidate_schema_cache
+    _schema_cache = {}
+    # Results of recently run SQL, keyed by a digest of the prepared query; see refresh
+    _result_cache = TTLCache(maxsize=64, ttl=300)
+    _cache_lock = threading.RLock()
+
     def __init__(self, project_id: str = "massi-financial-analysis", 
                  dataset_id: str = "finnish_finance_data", 
                  table_id: str = "budget_transactions"):
@@ -14,7 +47,7 @@ class RealDataProvider:
         self.project_id = project_id
         self.dataset_id = dataset_id
         self.table_id = table_id
-        self.client = bigquery.Client(project=project_id)
+        self.client = get_bq_client(project_id)
         self.table_ref = f"{project_id}.{dataset_id}.{table_id}"
         # Log startup with note about API being disabled
         logger.info("Initialized RealDataProvider - API access is disabled, using pre-loaded BigQuery data")
@@ -29,22 +62,7 @@ class RealDataProvider:
         Returns:
             str: Prepared SQL query
         """
-        # List of column names with Finnish characters
-        finnish_columns = [
-            "Nettokertymä",
-            "Lisätalousarvio",
-            "Käytettävissä",
-            "Kirjanpitoyksikkö",
-            "Loppusaldo"
-        ]
-        
-        # Add backticks to Finnish column names
-        for col in finnish_columns:
-            # Only replace if not already backticked
-            if f"`{col}`" not in query and col in query:
-                query = query.replace(col, f"`{col}`")
-        
-        return query
+        return _IDENT_RE.sub(r'`\1`', query)
 
     def execute_query(self, query: str) -> Optional[pd.DataFrame]:
         """
@@ -60,7 +78,17 @@ class RealDataProvider:
             # Prepare the query by handling Finnish characters
             query = self._prepare_sql_query(query)
             
-            logger.info(f"Executing query: {query[:100]}...")
+            # Repeated SQL (dashboards, reruns) skips the BigQuery round-trip entirely,
+            # unless its results change between runs (CURRENT_DATE, RAND, ...)
+            cacheable = is_deterministic_sql(query)
+            cache_key = hashlib.blake2b(query.encode('utf-8'), digest_size=16).digest()
+            with self._cache_lock:
+                cached = self._result_cache.get(cache_key) if cacheable else None
+            if cached is not None:
+                logger.debug("Result cache hit for query: %.100s", query)
+                return cached.copy(deep=False)
+            
+            logger.info("Executing query: %.100s...", query)
             
             # Configure query job
             job_config = bigquery.QueryJobConfig(use_query_cache=True)
@@ -71,10 +99,17 @@ class RealDataProvider:
             # Get the results
             results = query_job.result()
             
-            # Convert to DataFrame
-            df = results.to_dataframe()
+            # Download via the Storage Read API as Arrow; numbers become NumPy columns (NULL -> NaN), the
+            # rest stay Arrow-backed; one block per column and freeing Arrow buffers avoids a second copy
+            arrow_table = results.to_arrow(bqstorage_client=get_bqstorage_client())
+            df = arrow_table.to_pandas(types_mapper=arrow_dtype_mapper, split_blocks=True, self_destruct=True)
+            del arrow_table
             
-            logger.info(f"Query returned {len(df)} rows")
+            logger.info("Query returned %d rows", len(df))
+            if cacheable and len(df) < MAX_CACHED_ROWS:
+                with self._cache_lock:
+                    self._result_cache[cache_key] = df
+                return df.copy(deep=False)
             return df
             
         except GoogleAPIError as e:
@@ -86,8 +121,45 @@ class RealDataProvider:
             logger.error(f"Query that failed: {query}")
             return None
 
+    @classmethod
+    def refresh(cls) -> None:
+        """
+        Drop cached query results and years so the next execution reads from BigQuery again.
+        
+        Registered with invalidate_query_caches, which BigQueryLoader calls after a load.
+        """
+        with cls._cache_lock:
+            cls._result_cache.clear()
+            cls._years_cache.clear()
+
+    @classmethod
+    def invalidate_schema_cache(cls, table_ref: Optional[str] = None) -> None:
+        """
+        Forget cached table schemas, e.g. after the table was recreated or altered.
+        
+        Args:
+            table_ref (str, optional): Fully qualified table to forget; all tables if omitted
+        """
+        if table_ref is None:
+            cls._schema_cache.clear()
+        else:
+            cls._schema_cache.pop(table_ref, None)
+
     def get_schema(self) -> list:
         """Get the schema of the BigQuery table."""
+        cached = self._schema_cache.get(self.table_ref)
+        if cached is not None:
+            return [dict(field) for field in cached]
+
+        # Table metadata is a cheap API call, unlike an INFORMATION_SCHEMA query job
+        try:
+            table = self.client.get_table(self.table_ref)
+            schema = [{"name": field.name, "type": field.field_type} for field in table.schema]
+            self._schema_cache[self.table_ref] = schema
+            return [dict(field) for field in schema]
+        except Exception as e:
+            logger.warning(f"Could not read table metadata, querying INFORMATION_SCHEMA: {str(e)}")
+
         query = f"""
         SELECT column_name, data_type
         FROM `{self.project_id}.{self.dataset_id}.INFORMATION_SCHEMA.COLUMNS`
@@ -114,6 +186,11 @@ class RealDataProvider:
 
     def get_available_years(self) -> list:
         """Get available years in the data from BigQuery (not from API)."""
+        cache_key = (self.table_ref, int(time.time() // 86400))
+        cached = self._years_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
         query = f"""
         SELECT DISTINCT Vuosi 
         FROM `{self.table_ref}`
@@ -121,5 +198,12 @@ class RealDataProvider:
         """
         result = self.execute_query(query)
         if result is not None and not result.empty:
-            return result['Vuosi'].tolist()
-        return [2020, 2021, 2022, 2023, 2024]  # Fallback to default years if query fails
\ No newline at end of file
+            years = result['Vuosi'].tolist()
+            # Drop entries from earlier days before storing today's answer
+            for key in [k for k in self._years_cache if k[1] != cache_key[1]]:
+                del self._years_cache[key]
+            self._years_cache[cache_key] = years
+            return list(years)
+        return [2020, 2021, 2022, 2023, 2024]  # Fallback to default years if query fails
+
+register_cache(RealDataProvider.refresh)
@@ -1,34 +1,70 @@
+from functools import lru_cache
 from google.cloud import secretmanager
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PROJECT_ID = "massi-financial-analysis"
+
+_genai_lock = threading.Lock()
+_genai_configured = False
+
+@lru_cache(maxsize=1)
+def _get_sm_client() -> secretmanager.SecretManagerServiceClient:
+    """Secret Manager client shared by all lookups (one gRPC channel per process)."""
+    return secretmanager.SecretManagerServiceClient()
+
+@lru_cache(maxsize=4)
+def get_api_key_ai_studio(project_id: str = DEFAULT_PROJECT_ID) -> str:
+    """
+    Get Google AI Studio API key from Secret Manager, fetched once per project.
+
+    Args:
+        project_id (str): Google Cloud project holding the secret
+
+    Returns:
+        str: API key
+    """
+    name = f"projects/{project_id}/secrets/gemini-api-key-ai-studio/versions/latest"
+
+    try:
+        response = _get_sm_client().access_secret_version(request={"name": name})
+        api_key = response.payload.data.decode("UTF-8")
+        logger.info("Retrieved API key from Secret Manager (length: %d)", len(api_key))
+        return api_key
+    except Exception as e:
+        logger.error(f"Error retrieving API key: {e}")
+        raise
+
+def ensure_genai_configured() -> None:
+    """
+    Configure google.generativeai with the AI Studio API key, once per process.
+
+    Safe to call from every code path that uses genai; only the first call
+    fetches the key and configures the client, later calls return immediately.
+    Takes no options: the configuration is process-wide, so it must not depend
+    on which caller happens to run first.
+    """
+    global _genai_configured
+    if _genai_configured:
+        return
+    with _genai_lock:
+        if _genai_configured:
+            return
+        import google.generativeai as genai
+        genai.configure(api_key=get_api_key_ai_studio())
+        _genai_configured = True
+
 class SecretsManager:
-    _instance = None
-    _api_key_cache = None
-    
-    def __new__(cls, project_id="massi-financial-analysis"):
-        if cls._instance is None:
-            cls._instance = super(SecretsManager, cls).__new__(cls)
-            cls._instance.project_id = project_id
-        return cls._instance
-    
-    def get_api_key_ai_studio(self):
+    """Secret lookups for one project; values are cached at module level."""
+
+    def __init__(self, project_id: str = DEFAULT_PROJECT_ID):
+        self.project_id = project_id
+
+    def get_api_key_ai_studio(self) -> str:
         """Get Google AI Studio API key from Secret Manager."""
-        if self._api_key_cache is not None:
-            return self._api_key_cache
-            
-        client = secretmanager.SecretManagerServiceClient()
-        name = f"projects/{self.project_id}/secrets/gemini-api-key-ai-studio/versions/latest"
-        
-        try:
-            response = client.access_secret_version(request={"name": name})
-            self._api_key_cache = response.payload.data.decode("UTF-8")
-            logger.info(f"Retrieved API key from Secret Manager (length: {len(self._api_key_cache)})")
-            return self._api_key_cache
-        except Exception as e:
-            logger.error(f"Error retrieving API key: {e}")
-            raise
-
-# Create a singleton instance
-secrets_manager = SecretsManager()
\ No newline at end of file
+        return get_api_key_ai_studio(self.project_id)
+
+# Create a shared instance
+secrets_manager = SecretsManager()
@@ -2,34 +2,91 @@
 SQL executor for running BigQuery queries and returning results
 """
 
+import datetime
+import decimal
+import hashlib
 import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+from cachetools import TTLCache
 from google.cloud import bigquery
+from google.cloud.bigquery.enums import QueryApiMethod
 from google.api_core.exceptions import GoogleAPIError
-from typing import Optional, Dict, Any, Union
-from utils.secrets_manager import secrets_manager
-import google.generativeai as genai
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union
+from utils.bigquery_client import arrow_dtype_mapper, get_bq_client, get_bqstorage_client
+from utils.errors import BigQueryError
+from utils.query_cache import is_deterministic_sql, register_cache
 
 logger = logging.getLogger(__name__)
 
-# Use centralized secrets manager for API key retrieval
-api_key = secrets_manager.get_api_key_ai_studio()
-if not hasattr(genai, '_configured'):
-    genai.configure(api_key=api_key)
-    genai._configured = True
+# Result cache bounds: entry count, per-result in-memory size and seconds an entry stays valid
+CACHE_MAX_ENTRIES = 128
+CACHE_MAX_BYTES_PER_ENTRY = 50 * 1024 * 1024
+CACHE_TTL = 300
+
+# Finnish column names that must be backticked; matched as whole identifiers not already quoted
+_FINNISH_COLUMNS = (
+    'Alkuperäinen_talousarvio',
+    'Voimassaoleva_talousarvio',
+    'Nettokertymä',
+    'Käytettävissä',
+    'Loppusaldo'
+)
+_FINNISH_COLUMN_RE = re.compile(
+    r'(?<![`\w])(' + '|'.join(map(re.escape, _FINNISH_COLUMNS)) + r')(?![`\w])'
+)
+
+# BigQuery parameter type per Python type; subclasses resolve through their MRO
+_PARAM_TYPES = {
+    bool: 'BOOL',
+    int: 'INT64',
+    float: 'FLOAT64',
+    str: 'STRING',
+    bytes: 'BYTES',
+    decimal.Decimal: 'NUMERIC',
+    datetime.datetime: 'TIMESTAMP',
+    datetime.date: 'DATE',
+    datetime.time: 'TIME',
+}
+
+# Queries billing more than this fail in BigQuery (maximum_bytes_billed on every job)
+DEFAULT_MAX_BYTES_SCANNED = 50 * 1024**3
+
+# Dry-run statistics are reused for this many seconds, for at most DRY_RUN_CACHE_ENTRIES queries
+DRY_RUN_CACHE_TTL = 60
+DRY_RUN_CACHE_ENTRIES = 512
+
+# Parametrized queries run at once by execute_many, well under BigQuery's interactive concurrency limit
+MAX_CONCURRENT_QUERIES = 8
+
+# Results with fewer rows come back in the first REST pages; a Storage API read session only adds latency
+STORAGE_API_MIN_ROWS = 10_000
 
 class SQLExecutor:
     """Class for executing SQL queries against BigQuery."""
     
-    def __init__(self, project_id: str):
+    def __init__(self, project_id: str, max_bytes_scanned: Optional[int] = DEFAULT_MAX_BYTES_SCANNED):
         """
         Initialize the SQL executor.
         
         Args:
             project_id (str): Google Cloud project ID
+            max_bytes_scanned (Optional[int]): Most bytes any query may bill, enforced
+                by BigQuery on every job; None disables the limit
         """
         self.project_id = project_id
-        self.client = bigquery.Client(project=project_id)
+        self.max_bytes_scanned = max_bytes_scanned
+        self.client = get_bq_client(project_id)
+        # (sql digest, max_results) -> DataFrame; emptied by invalidate_query_caches after loads
+        self._cache = TTLCache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+        self._cache_lock = threading.Lock()
+        register_cache(self.clear_cache)
+        # sql digest -> (monotonic time, get_query_info result), oldest first
+        self._dryrun_cache = OrderedDict()
         
     def execute_query(self, sql_query: str, max_results: int = 10000) -> Optional[pd.DataFrame]:
         """
@@ -46,23 +103,27 @@ class SQLExecutor:
             # Sanitize SQL for Finnish characters
             sql_query = self._sanitize_sql(sql_query)
             
-            logger.info(f"Executing SQL query: {sql_query}")
+            cacheable = is_deterministic_sql(sql_query)
+            if cacheable:
+                cache_key = (hashlib.blake2b(sql_query.encode('utf-8'), digest_size=16).digest(), max_results)
+                with self._cache_lock:
+                    cached = self._cache.get(cache_key)
+                if cached is not None:
+                    logger.debug("Result cache hit for SQL query: %.100s", sql_query)
+                    return cached.copy(deep=False)
             
-            # Configure query job
-            job_config = bigquery.QueryJobConfig(
-                use_query_cache=True
-            )
+            logger.info("Executing SQL query: %s", sql_query)
             
             # Run the query
-            query_job = self.client.query(sql_query, job_config=job_config)
+            query_job = self.client.query(sql_query, job_config=self._job_config())
             
             # Get the results
-            results = query_job.result(max_results=max_results)
+            df = self._results_to_dataframe(query_job, max_results)
             
-            # Convert to DataFrame
-            df = results.to_dataframe()
-            
-            logger.info(f"Query executed successfully. Returned {len(df)} rows.")
+            logger.info("Query executed successfully. Returned %d rows.", len(df))
+            if cacheable:
+                self._cache_result(cache_key, df)
+                return df.copy(deep=False)
             return df
             
         except GoogleAPIError as e:
@@ -72,16 +133,122 @@ class SQLExecutor:
             logger.error(f"Error executing query: {str(e)}")
             return None
             
-    def get_query_info(self, sql_query: str) -> Dict[str, Any]:
+    def execute_query_batches(self, sql_query: str, page_size: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Execute a SQL query and yield its results one batch at a time.
+        
+        Only about one batch is held in memory at a time, so callers that aggregate
+        or write out results incrementally can handle results larger than RAM.
+        Results are not cached.
+        
+        Args:
+            sql_query (str): SQL query to execute
+            page_size (int): Rows per batch when paging through REST (Storage API
+                batches follow the read stream's record batches)
+            
+        Yields:
+            pd.DataFrame: Consecutive slices of the query results (see arrow_dtype_mapper)
+            
+        Raises:
+            BigQueryError: If the query or the download fails
+        """
+        sql_query = self._sanitize_sql(sql_query)
+        logger.info("Executing SQL query in batches: %s", sql_query)
+        
+        try:
+            query_job = self.client.query(sql_query, job_config=self._job_config())
+            results = query_job.result(page_size=page_size)
+            for batch in results.to_arrow_iterable(bqstorage_client=get_bqstorage_client()):
+                yield batch.to_pandas(types_mapper=arrow_dtype_mapper)
+        except GoogleAPIError as e:
+            logger.error(f"BigQuery API error: {str(e)}")
+            raise BigQueryError(str(e)) from e
+
+    def _job_config(self, **options) -> bigquery.QueryJobConfig:
+        """
+        Build a fresh job configuration capped at max_bytes_scanned billed bytes.
+        
+        BigQuery fails a job that would bill more, before running it, so the cap
+        costs no extra request. A new config is built per job: each QueryJob
+        writes into the config it was given, so configs are never shared.
+        
+        Args:
+            **options: Other QueryJobConfig properties
+            
+        Returns:
+            bigquery.QueryJobConfig: Job configuration
+        """
+        job_config = bigquery.QueryJobConfig(**options)
+        if self.max_bytes_scanned is not None:
+            job_config.maximum_bytes_billed = self.max_bytes_scanned
+        return job_config
+
+    def _results_to_dataframe(self, query_job: bigquery.QueryJob, max_results: int) -> pd.DataFrame:
+        """
+        Download a finished query's results, through the Storage Read API when they are large.
+        
+        Args:
+            query_job (bigquery.QueryJob): Query job to read
+            max_results (int): Maximum number of rows to return
+            
+        Returns:
+            pd.DataFrame: Query results; NumPy numeric columns, other columns Arrow-backed
+        """
+        results = query_job.result()
+        total_rows = results.total_rows or 0
+        if total_rows > max_results:
+            # The Storage API can't stop at a row limit, so truncated reads page through REST
+            results = query_job.result(max_results=max_results)
+        
+        # Large results stream as Arrow over gRPC and are converted column-wise
+        use_storage_api = STORAGE_API_MIN_ROWS <= total_rows <= max_results
+        arrow_table = results.to_arrow(
+            bqstorage_client=get_bqstorage_client() if use_storage_api else None,
+            create_bqstorage_client=False
+        )
+        # Non-numeric Arrow buffers become the columns directly: no block consolidation or object strings
+        df = arrow_table.to_pandas(types_mapper=arrow_dtype_mapper, split_blocks=True, self_destruct=True)
+        del arrow_table
+        return df
+
+    def _cache_result(self, cache_key: tuple, df: pd.DataFrame) -> None:
+        """
+        Remember a query result for CACHE_TTL seconds, evicting the least recently used ones beyond the limit.
+        
+        Args:
+            cache_key (tuple): (sql digest, max_results)
+            df (pd.DataFrame): Query results; not cached above CACHE_MAX_BYTES_PER_ENTRY
+        """
+        if df.memory_usage(index=True, deep=True).sum() >= CACHE_MAX_BYTES_PER_ENTRY:
+            return
+        with self._cache_lock:
+            self._cache[cache_key] = df
+
+    def clear_cache(self) -> None:
+        """Drop cached query results so the next execution reads from BigQuery again."""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def get_query_info(self, sql_query: str, refresh: bool = False) -> Dict[str, Any]:
         """
         Get information about a query without executing it.
         
+        Results are reused for DRY_RUN_CACHE_TTL seconds per SQL text.
+        
         Args:
             sql_query (str): SQL query to analyze
+            refresh (bool): Dry-run again even if a recent result is cached
             
         Returns:
             Dict[str, Any]: Information about the query
         """
+        cache_key = hashlib.blake2b(sql_query.encode('utf-8'), digest_size=16).digest()
+        if not refresh:
+            with self._cache_lock:
+                entry = self._dryrun_cache.get(cache_key)
+            if entry is not None and time.monotonic() - entry[0] < DRY_RUN_CACHE_TTL:
+                return dict(entry[1])
+        
         try:
             # Configure dry run job
             job_config = bigquery.QueryJobConfig(
@@ -90,14 +257,20 @@ class SQLExecutor:
             )
             
             # Start job
-            query_job = self.client.query(sql_query, job_config=job_config)
+            query_job = self._dry_run(sql_query, job_config)
             
             # Return info
-            return {
+            info = {
                 "bytes_processed": query_job.total_bytes_processed,
                 "estimated_cost_usd": query_job.total_bytes_processed / (1024**4) * 5,  # Approx. $5 per TB
                 "is_cached": query_job.cache_hit
             }
+            with self._cache_lock:
+                self._dryrun_cache.pop(cache_key, None)
+                self._dryrun_cache[cache_key] = (time.monotonic(), info)
+                if len(self._dryrun_cache) > DRY_RUN_CACHE_ENTRIES:
+                    self._dryrun_cache.popitem(last=False)
+            return dict(info)
             
         except Exception as e:
             logger.error(f"Error analyzing query: {str(e)}")
@@ -105,6 +278,29 @@ class SQLExecutor:
                 "error": str(e)
             }
     
+    def _dry_run(self, sql_query: str, job_config: bigquery.QueryJobConfig) -> bigquery.QueryJob:
+        """
+        Dry-run a query through jobs.query, falling back to jobs.insert.
+        
+        jobs.query answers in a single request; the fallback covers responses the
+        client library can't turn into a job (e.g. a dry run without a job reference).
+        Query errors (GoogleAPIError) are raised as-is rather than retried.
+        
+        Args:
+            sql_query (str): SQL query to analyze
+            job_config (bigquery.QueryJobConfig): Dry-run job configuration
+            
+        Returns:
+            bigquery.QueryJob: Dry-run job carrying the query statistics
+        """
+        try:
+            return self.client.query(sql_query, job_config=job_config, api_method=QueryApiMethod.QUERY)
+        except GoogleAPIError:
+            raise
+        except Exception as e:
+            logger.debug("jobs.query dry run unavailable, using jobs.insert: %s", e)
+            return self.client.query(sql_query, job_config=job_config)
+    
     def execute_query_with_parameters(self, sql_query: str, 
                                       params: Dict[str, Union[str, int, float, bool]], 
                                       max_results: int = 10000) -> Optional[pd.DataFrame]:
@@ -120,10 +316,10 @@ class SQLExecutor:
             Optional[pd.DataFrame]: Query results as DataFrame or None if query failed
         """
         try:
-            logger.info(f"Executing parametrized SQL query: {sql_query}")
+            logger.info("Executing parametrized SQL query: %s", sql_query)
             
             # Configure parametrized query
-            job_config = bigquery.QueryJobConfig(
+            job_config = self._job_config(
                 use_query_cache=True,
                 query_parameters=[
                     bigquery.ScalarQueryParameter(name, self._get_param_type(value), value)
@@ -135,12 +331,9 @@ class SQLExecutor:
             query_job = self.client.query(sql_query, job_config=job_config)
             
             # Get the results
-            results = query_job.result(max_results=max_results)
+            df = self._results_to_dataframe(query_job, max_results)
             
-            # Convert to DataFrame
-            df = results.to_dataframe()
-            
-            logger.info(f"Parametrized query executed successfully. Returned {len(df)} rows.")
+            logger.info("Parametrized query executed successfully. Returned %d rows.", len(df))
             return df
             
         except GoogleAPIError as e:
@@ -150,7 +343,34 @@ class SQLExecutor:
             logger.error(f"Error executing parametrized query: {str(e)}")
             return None
     
-    def _get_param_type(self, value: Union[str, int, float, bool]) -> str:
+    def execute_many(self, queries: List[Tuple[str, Dict[str, Union[str, int, float, bool]]]],
+                     max_results: int = 10000) -> List[Optional[pd.DataFrame]]:
+        """
+        Execute several parametrized SQL queries concurrently.
+        
+        Jobs are submitted from a small thread pool, so total latency is close to
+        that of the slowest query. Rate-limited requests are retried with
+        exponential backoff by the client's default retry.
+        
+        Args:
+            queries (List[Tuple[str, Dict[str, Union[str, int, float, bool]]]]):
+                (SQL query, parameter values) pairs
+            max_results (int): Maximum number of results to return per query
+            
+        Returns:
+            List[Optional[pd.DataFrame]]: Results in the order of `queries`,
+                None for queries that failed
+        """
+        if not queries:
+            return []
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_QUERIES, len(queries))) as executor:
+            futures = [
+                executor.submit(self.execute_query_with_parameters, sql_query, params, max_results)
+                for sql_query, params in queries
+            ]
+            return [future.result() for future in futures]
+    
+    def _get_param_type(self, value: Any) -> str:
         """
         Get BigQuery parameter type for a Python value.
         
@@ -160,16 +380,14 @@ class SQLExecutor:
         Returns:
             str: BigQuery parameter type
         """
-        if isinstance(value, str):
-            return 'STRING'
-        elif isinstance(value, bool):
-            return 'BOOL'
-        elif isinstance(value, int):
-            return 'INT64'
-        elif isinstance(value, float):
-            return 'FLOAT64'
-        else:
-            return 'STRING'  # Default to string
+        param_type = _PARAM_TYPES.get(type(value))
+        if param_type is not None:
+            return param_type
+        # Subclasses (e.g. numpy.float64, pd.Timestamp) map like their nearest known base
+        for cls in type(value).__mro__[1:]:
+            if cls in _PARAM_TYPES:
+                return _PARAM_TYPES[cls]
+        return 'STRING'  # Default to string
 
     def _sanitize_sql(self, sql_query: str) -> str:
         """
@@ -181,19 +399,5 @@ class SQLExecutor:
         Returns:
             str: Sanitized SQL query
         """
-        # Ensure Finnish columns are properly escaped
-        finnish_columns = {
-            'Alkuperäinen_talousarvio': '`Alkuperäinen_talousarvio`',
-            'Voimassaoleva_talousarvio': '`Voimassaoleva_talousarvio`',
-            'Nettokertymä': '`Nettokertymä`',
-            'Käytettävissä': '`Käytettävissä`',
-            'Loppusaldo': '`Loppusaldo`'
-        }
-        
-        for col, quoted_col in finnish_columns.items():
-            # Replace unquoted references
-            sql_query = sql_query.replace(f' {col} ', f' {quoted_col} ')
-            sql_query = sql_query.replace(f'.{col} ', f'.{quoted_col} ')
-            sql_query = sql_query.replace(f'({col})', f'({quoted_col})')
-        
-        return sql_query
\ No newline at end of file
+        # Backtick unquoted Finnish column references in one pass
+        return _FINNISH_COLUMN_RE.sub(r'`\1`', sql_query)
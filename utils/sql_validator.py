@@ -3,14 +3,86 @@ SQL validator with Gemini 2.5 Pro's code execution tool.
 Validates SQL queries before execution in BigQuery.
 """
 
+import copy
+import hashlib
 import logging
 import re
 import json
-from typing import Dict, Any, Optional, List
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Iterator, Optional, List, Tuple
+import orjson
 import google.generativeai as genai
+from utils.secrets_manager import ensure_genai_configured
 
 logger = logging.getLogger(__name__)
 
+# Columns with Finnish characters that should be backticked in SQL
+_FINNISH_VALIDATION_COLS = (
+    "Käytettävissä", "Lisätalousarvio", "Nettokertymä",
+    "Nettokertymä_ko_vuodelta", "Kirjanpitoyksikkö", "Loppusaldo",
+    "Alkuperäinen_talousarvio"
+)
+# Whole-identifier references to those columns that aren't backticked
+_UNQUOTED_FI_RE = re.compile(
+    r'(?<![`\w])(' + '|'.join(map(re.escape, sorted(_FINNISH_VALIDATION_COLS, key=len, reverse=True))) + r')(?![`\w])'
+)
+_BRANCH_RE = re.compile(r'Ha_Tunnus\s*=\s*(\d+)', re.IGNORECASE)
+# Upper-cased identifiers and keywords, for keyword checks on a single token set
+_TOKEN_RE = re.compile(r'[A-Z_][A-Z_0-9]*')
+_AGGREGATE_FUNCTIONS = frozenset({"SUM", "AVG", "COUNT", "MAX", "MIN"})
+_VALID_BRANCH_CODES = frozenset(range(23, 33))
+
+# Model validations kept per (SQL, schema); least recently used are evicted
+VALIDATION_CACHE_SIZE = 256
+
+@lru_cache(maxsize=8)
+def _format_schema_fields(fields: Tuple[Tuple[str, str], ...]) -> str:
+    """Render (name, type) pairs as prompt lines; repeated schemas are formatted once."""
+    return "\n".join(f"- {name} ({field_type})" for name, field_type in fields)
+
+def _json_objects(text: str) -> Iterator[str]:
+    """
+    Yield balanced {...} spans of a text in order of their opening brace.
+
+    A forward scan tracking brace depth (and skipping braces inside JSON strings)
+    finds each object's end without regex backtracking over the whole response.
+
+    Args:
+        text (str): Model response
+
+    Yields:
+        str: Candidate JSON object text
+    """
+    start = text.find('{')
+    while start != -1:
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(text)):
+            c = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif c == '\\':
+                    escaped = True
+                elif c == '"':
+                    in_string = False
+            elif c == '"':
+                in_string = True
+            elif c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+                if depth == 0:
+                    yield text[start:i + 1]
+                    break
+        else:
+            return  # Unbalanced from here on
+        start = text.find('{', start + 1)
+
 class SQLValidator:
     """SQL validator using Gemini 2.5 Pro's code execution capabilities."""
     
@@ -21,10 +93,15 @@ class SQLValidator:
         self.model_name = "gemini-2.5-pro-preview-03-25"
         
         # Initialize the generative AI model
+        ensure_genai_configured()
         self.model = genai.GenerativeModel(
             self.model_name,
             tools=[{"code_execution": {}}]
         )
+        
+        # blake2b(sql | schema) -> validation result
+        self._val_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._val_cache_lock = threading.Lock()
     
     def validate_sql(self, sql: str, schema: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -37,6 +114,19 @@ class SQLValidator:
         Returns:
             Dict[str, Any]: Validation result
         """
+        cache_key = hashlib.blake2b(
+            sql.encode('utf-8') + b'|' + json.dumps(schema, sort_keys=True, default=str).encode('utf-8'),
+            digest_size=16
+        ).digest()
+        with self._val_cache_lock:
+            cached = self._val_cache.get(cache_key)
+            if cached is not None:
+                self._val_cache.move_to_end(cache_key)
+        if cached is not None:
+            logger.debug("SQL validation cache hit")
+            # Callers get their own lists to mutate
+            return copy.deepcopy(cached)
+
         validation_prompt = f"""
 Validate this SQL query for Finnish government financial data:
 
@@ -67,18 +157,25 @@ Execute validation checks using code execution. Return results as JSON:
 """
 
         try:
-            response = self.model.generate_content(validation_prompt)
+            # Run the custom checks while the model request is in flight
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                response_future = executor.submit(self.model.generate_content, validation_prompt)
+                custom_checks = self._perform_custom_validation(sql, schema)
+                response = response_future.result()
             
             # Parse the validation result
-            result = self._parse_validation_result(response.text)
-            
-            # Additional custom validation
-            custom_checks = self._perform_custom_validation(sql, schema)
+            result, parsed = self._parse_validation_result(response.text)
             
             # Merge results
             final_result = self._merge_validation_results(result, custom_checks)
             
-            logger.info(f"SQL validation completed: {final_result['is_valid']}")
+            logger.info("SQL validation completed: %s", final_result['is_valid'])
+            # A malformed model reply is not a verdict; the next call asks again
+            if parsed:
+                with self._val_cache_lock:
+                    self._val_cache[cache_key] = copy.deepcopy(final_result)
+                    if len(self._val_cache) > VALIDATION_CACHE_SIZE:
+                        self._val_cache.popitem(last=False)
             return final_result
             
         except Exception as e:
@@ -93,36 +190,44 @@ Execute validation checks using code execution. Return results as JSON:
 
     def _format_schema(self, schema: List[Dict[str, Any]]) -> str:
         """Format schema for validation prompt."""
-        return "\n".join([
-            f"- {field['name']} ({field['type']})"
-            for field in schema
-        ])
+        return _format_schema_fields(tuple((field['name'], field['type']) for field in schema))
 
-    def _parse_validation_result(self, response_text: str) -> Dict[str, Any]:
-        """Parse validation result from model response."""
-        try:
-            # Extract JSON from response
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
-                # Fallback if no JSON found
-                return {
-                    "is_valid": False,
-                    "syntax_errors": ["Could not parse validation result"],
-                    "field_errors": [],
-                    "warnings": [],
-                    "suggestions": []
-                }
-        except Exception as e:
-            logger.error(f"Failed to parse validation result: {str(e)}")
+    def _parse_validation_result(self, response_text: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Parse validation result from model response.
+        
+        Returns:
+            Tuple[Dict[str, Any], bool]: Validation result, and whether the reply held
+                valid JSON (False for the invalid placeholder result returned otherwise)
+        """
+        # The verdict comes last; code execution output before it may hold other dicts
+        error = None
+        for candidate in reversed(list(_json_objects(response_text))):
+            try:
+                result = orjson.loads(candidate)
+            except orjson.JSONDecodeError as e:
+                error = e
+                continue
+            if isinstance(result, dict) and "is_valid" in result:
+                return result, True
+
+        if error is None:
+            # Fallback if no JSON found
             return {
                 "is_valid": False,
-                "syntax_errors": [f"JSON parsing error: {str(e)}"],
+                "syntax_errors": ["Could not parse validation result"],
                 "field_errors": [],
                 "warnings": [],
                 "suggestions": []
-            }
+            }, False
+        logger.error(f"Failed to parse validation result: {str(error)}")
+        return {
+            "is_valid": False,
+            "syntax_errors": [f"JSON parsing error: {str(error)}"],
+            "field_errors": [],
+            "warnings": [],
+            "suggestions": []
+        }, False
 
     def _perform_custom_validation(self, sql: str, schema: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Perform additional custom validation checks."""
@@ -134,37 +239,33 @@ Execute validation checks using code execution. Return results as JSON:
             "suggestions": []
         }
         
-        # Check for Finnish character handling
-        finnish_columns = [
-            "Käytettävissä", "Lisätalousarvio", "Nettokertymä",
-            "Nettokertymä_ko_vuodelta", "Kirjanpitoyksikkö", "Loppusaldo",
-            "Alkuperäinen_talousarvio"
-        ]
+        # Check for Finnish character handling (one warning per column)
+        unquoted = dict.fromkeys(m.group(1) for m in _UNQUOTED_FI_RE.finditer(sql))
+        for col in unquoted:
+            result["warnings"].append(
+                f"Column '{col}' should be backticked for proper handling of Finnish characters"
+            )
         
-        for col in finnish_columns:
-            if col in sql and f'`{col}`' not in sql:
-                result["warnings"].append(
-                    f"Column '{col}' should be backticked for proper handling of Finnish characters"
-                )
+        # One tokenization pass; the checks below are set lookups
+        tokens = set(_TOKEN_RE.findall(sql.upper()))
         
         # Check for time constraints
-        if "Vuosi" not in sql:
+        if "VUOSI" not in tokens:
             result["warnings"].append(
                 "No year constraint found - query may return excessive data"
             )
         
         # Check for administrative branch
-        if "Ha_Tunnus" in sql:
+        if "HA_TUNNUS" in tokens:
             # Validate branch codes
-            branch_codes = re.findall(r'Ha_Tunnus\s*=\s*(\d+)', sql)
-            for code in branch_codes:
-                if int(code) not in [23, 24, 25, 26, 27, 28, 29, 30, 31, 32]:
+            for code in _BRANCH_RE.findall(sql):
+                if int(code) not in _VALID_BRANCH_CODES:
                     result["warnings"].append(
                         f"Unusual administrative branch code: {code}"
                     )
         
         # Check for proper aggregations
-        if "GROUP BY" in sql and not any(agg in sql for agg in ["SUM", "AVG", "COUNT", "MAX", "MIN"]):
+        if "GROUP" in tokens and tokens.isdisjoint(_AGGREGATE_FUNCTIONS):
             result["suggestions"].append(
                 "Query has GROUP BY but no aggregation functions - consider using SUM, AVG, etc."
             )
@@ -173,16 +274,10 @@ Execute validation checks using code execution. Return results as JSON:
 
     def _merge_validation_results(self, result1: Dict[str, Any], result2: Dict[str, Any]) -> Dict[str, Any]:
         """Merge two validation results."""
-        merged = {
-            "is_valid": result1["is_valid"] and result2["is_valid"],
-            "syntax_errors": result1["syntax_errors"] + result2["syntax_errors"],
-            "field_errors": result1["field_errors"] + result2["field_errors"],
-            "warnings": result1["warnings"] + result2["warnings"],
-            "suggestions": result1["suggestions"] + result2["suggestions"]
-        }
+        merged = {"is_valid": result1["is_valid"] and result2["is_valid"]}
         
-        # Remove duplicates
-        for key in ["syntax_errors", "field_errors", "warnings", "suggestions"]:
-            merged[key] = list(set(merged[key]))
+        # Concatenate and drop duplicates, keeping first-seen order
+        for key in ("syntax_errors", "field_errors", "warnings", "suggestions"):
+            merged[key] = list(dict.fromkeys(result1.get(key, []) + result2.get(key, [])))
         
         return merged
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+Vertex AI explicit context caching for static prompt prefixes.
+"""
+
+import atexit
+import datetime
+import hashlib
+import logging
+import threading
+import time
+from typing import Optional
+import vertexai
+from vertexai.preview import caching
+from vertexai.preview.generative_models import GenerativeModel
+
+logger = logging.getLogger(__name__)
+
+MIN_CACHE_TOKENS = 2048  # Vertex AI rejects cached contents smaller than this
+CACHE_TTL_SECONDS = 3600
+CACHE_REFRESH_MARGIN = 60  # Recreate a cache this many seconds before it expires
+
+class VertexCacheManager:
+    """Creates, reuses and cleans up Vertex AI cachedContents resources."""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._caches = {}
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def get_or_create(self, project_id: str, location: str, model_name: str,
+                      prefix: str) -> Optional[str]:
+        """
+        Get the resource name of a cache holding `prefix`, creating it if needed.
+
+        Args:
+            project_id (str): Google Cloud project ID
+            location (str): Vertex AI region
+            model_name (str): Versioned model name the cache is created for
+            prefix (str): Static prompt text to cache
+
+        Returns:
+            Optional[str]: Cache resource name, or None if the prefix is too small
+                or the cache could not be created (callers send the full prompt)
+        """
+        key = (project_id, location, model_name, hashlib.blake2b(prefix.encode('utf-8'), digest_size=16).hexdigest())
+        with self._lock:
+            entry = self._caches.get(key)
+            if entry is not None and entry[1] - CACHE_REFRESH_MARGIN > time.monotonic():
+                return entry[0].resource_name
+
+            try:
+                vertexai.init(project=project_id, location=location)
+                token_count = GenerativeModel(model_name).count_tokens(prefix).total_tokens
+                if token_count < MIN_CACHE_TOKENS:
+                    logger.info("Prompt prefix has %d tokens, below the %d token cache minimum; caching disabled",
+                                token_count, MIN_CACHE_TOKENS)
+                    return None
+
+                cached = caching.CachedContent.create(
+                    model_name=model_name,
+                    contents=[prefix],
+                    ttl=datetime.timedelta(seconds=CACHE_TTL_SECONDS),
+                )
+            except Exception as e:
+                logger.warning(f"Could not create Vertex AI context cache: {str(e)}")
+                return None
+
+            if entry is not None:
+                self._delete(entry[0])
+            self._caches[key] = (cached, time.monotonic() + CACHE_TTL_SECONDS)
+            logger.info("Created Vertex AI context cache %s (%d tokens)", cached.resource_name, token_count)
+            return cached.resource_name
+
+    @staticmethod
+    def model_for(resource_name: str) -> GenerativeModel:
+        """Build a model that prepends the cached prefix to every request."""
+        return GenerativeModel.from_cached_content(cached_content=resource_name)
+
+    def delete_all(self) -> None:
+        """Delete every cache created by this process so none are left billing storage."""
+        with self._lock:
+            entries = list(self._caches.values())
+            self._caches.clear()
+        for cached, _ in entries:
+            self._delete(cached)
+
+    @staticmethod
+    def _delete(cached: caching.CachedContent) -> None:
+        try:
+            cached.delete()
+        except Exception as e:
+            logger.warning(f"Could not delete Vertex AI context cache: {str(e)}")
+
+# Create a singleton instance
+vertex_cache_manager = VertexCacheManager()
+atexit.register(vertex_cache_manager.delete_all)
@@ -1,38 +1,270 @@
 """
 Simple visualization utilities for Finnish financial data.
+
+Plotly is imported by the methods that build figures, so importing this module
+(e.g. only for detect_visualization_type) doesn't load it.
 """
 
+from __future__ import annotations
+
+import logging
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import Dict, Any, Optional
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from typing import TYPE_CHECKING, Dict, Any, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+logger = logging.getLogger(__name__)
+
+# Lower-cased column names with a special role
+_TIME_KEYS = frozenset({'year', 'vuosi', 'month', 'kk', 'quarter'})
+_YEAR_KEYS = frozenset({'year', 'vuosi'})
+_CATEGORY_KEYS = frozenset({'hallinnonala', 'ministry', 'administrative_branch', 'paaluokka', 'momentti', 'luku'})
+_MINISTRY_KEYS = frozenset({'hallinnonala', 'ministry', 'administrative_branch'})
+
+# Common labels in Finnish and English (read-only; shared by every visualizer)
+LABEL_TRANSLATIONS: Mapping[str, str] = MappingProxyType({
+    'Vuosi': 'Year',
+    'Kk': 'Month',
+    'quarter': 'Quarter',
+    'Nettokertymä': 'Net Amount',
+    'Alkuperäinen_talousarvio': 'Original Budget',
+    'Voimassaoleva_talousarvio': 'Current Budget',
+    'Hallinnonala': 'Administrative Branch',
+    'spending': 'Spending',
+    'budget': 'Budget',
+    'ministry': 'Ministry',
+    'original_budget': 'Original Budget',
+    'current_budget': 'Current Budget',
+    'year': 'Year',
+    'month': 'Month'
+})
+# Same mapping as a Series, so a column Index is translated in one vectorized lookup
+_LABEL_TRANS_SERIES = pd.Series(dict(LABEL_TRANSLATIONS))
+
+_ColumnClasses = namedtuple('_ColumnClasses', ['time_cols', 'numeric_cols', 'category_cols', 'non_numeric_cols'])
+
+@lru_cache(maxsize=1)
+def _register_templates() -> None:
+    """Register the layouts shared by all figures as Plotly templates, once per process."""
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    from plotly.colors import sequential
+
+    # Charts drawn in one color, charts drawn from the whole blue scale, and compact figures
+    pio.templates['massi_single'] = go.layout.Template(layout=dict(height=400, colorway=[sequential.Blues[5]]))
+    pio.templates['massi_scale'] = go.layout.Template(layout=dict(height=400, colorway=sequential.Blues))
+    pio.templates['massi_small'] = go.layout.Template(layout=dict(height=300, margin=dict(l=20, r=20, t=40, b=20)))
+
+def _template(name: str) -> str:
+    """
+    Template spec applying one of the shared layouts on top of the default template.
+
+    Args:
+        name (str): 'massi_single', 'massi_scale' or 'massi_small'
+
+    Returns:
+        str: Template name for Plotly's `template` argument
+    """
+    import plotly.io as pio
+    _register_templates()
+    default = pio.templates.default
+    return f"{default}+{name}" if default else name
+
+def _is_numeric(dtype) -> bool:
+    """Whether a column dtype holds numbers (booleans excluded)."""
+    return is_numeric_dtype(dtype) and not is_bool_dtype(dtype)
+
+@lru_cache(maxsize=256)
+def _classify_columns_cached(columns: Tuple[Any, ...], dtypes: Tuple[Any, ...]) -> _ColumnClasses:
+    """Split column names by role; every name is lower-cased once."""
+    lowered = [col.lower() for col in columns]
+    numeric = [_is_numeric(dtype) for dtype in dtypes]
+    return _ColumnClasses(
+        time_cols=tuple(col for col, low in zip(columns, lowered) if low in _TIME_KEYS),
+        numeric_cols=tuple(col for col, is_num in zip(columns, numeric) if is_num),
+        category_cols=tuple(col for col, low in zip(columns, lowered) if low in _CATEGORY_KEYS),
+        non_numeric_cols=tuple(col for col, is_num in zip(columns, numeric) if not is_num),
+    )
+
+def _classify_columns(df: pd.DataFrame) -> _ColumnClasses:
+    """
+    Classify a DataFrame's columns by role (time, numeric, category, non-numeric).
+
+    Args:
+        df (pd.DataFrame): Data to visualize
+
+    Returns:
+        _ColumnClasses: Column names per role, in column order
+    """
+    return _classify_columns_cached(tuple(df.columns), tuple(df.dtypes))
+
+def _format_numbers(values: pd.Series) -> np.ndarray:
+    """
+    Format a numeric column as '1,234.50' strings, with '' for missing values.
+
+    Values are unboxed to Python floats in one call and formatted in a single
+    comprehension, instead of one Series.apply callback per cell.
+
+    Args:
+        values (pd.Series): Numeric column
+
+    Returns:
+        np.ndarray: Object array of formatted strings
+    """
+    floats = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    mask = ~np.isnan(floats)
+    formatted = np.full(len(floats), "", dtype=object)
+    formatted[mask] = [format(x, ',.2f') for x in floats[mask].tolist()]
+    return formatted
+
+def _plot_values(values: pd.Series) -> np.ndarray:
+    """
+    Numeric column as a float array for a Plotly trace, with NaN for missing values.
+
+    The array is downcast to float32, halving the figure payload, only when
+    every value survives the round trip; euro amounts are never rounded.
+
+    Args:
+        values (pd.Series): Numeric column
+
+    Returns:
+        np.ndarray: float32 or float64 array
+    """
+    floats = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    narrow = floats.astype(np.float32)
+    if np.array_equal(narrow, floats, equal_nan=True):
+        return narrow
+    return floats
+
+@lru_cache(maxsize=256)
+def _detect_viz_type_cached(columns: Tuple[Any, ...], dtypes: Tuple[Any, ...], nrows: int) -> str:
+    """
+    Pick a visualization type from a DataFrame's shape; see detect_visualization_type.
+
+    Args:
+        columns (Tuple[Any, ...]): Column names
+        dtypes (Tuple[Any, ...]): Column dtypes, in column order
+        nrows (int): Number of rows
+
+    Returns:
+        str: Visualization type
+    """
+    classes = _classify_columns_cached(columns, dtypes)
+    numeric_columns = classes.numeric_cols
+
+    # Check for time series data
+    time_columns = classes.time_cols
+
+    # Check for categorical data
+    category_columns = classes.category_cols
+
+    # Logic for visualization type selection
+    if nrows == 1 and len(numeric_columns) >= 1:
+        # Single row with numeric values - use a single value display
+        return 'single_value'
+    elif nrows == 1 and len(numeric_columns) > 1:
+        # Single row with multiple values - use bar for comparison
+        return 'bar'
+    elif len(time_columns) >= 1 and len(numeric_columns) >= 1:
+        # Time series data - check for multiple numeric values
+        if nrows > 1:  # Need at least 2 points for a line chart
+            if len(numeric_columns) > 2:  # Too many lines can be confusing
+                return 'time_bar'  # Use bar chart instead
+            elif len(numeric_columns) > 1:
+                return 'time_multi_line'
+            else:
+                return 'time_line'
+        else:
+            return 'single_value'
+    elif category_columns and len(numeric_columns) >= 1:
+        # Categorical data with numeric values
+        if nrows <= 8:  # Good for pie charts
+            return 'pie'
+        else:
+            return 'bar'
+    elif nrows > 10 and len(numeric_columns) >= 1:
+        # Large datasets
+        if any(col.lower() in _YEAR_KEYS for col in time_columns):
+            return 'time_bar'
+        else:
+            return 'bar'
+    elif nrows <= 10 and len(numeric_columns) >= 1:
+        # Small datasets
+        return 'bar'
+    else:
+        # Default to table when no clear pattern
+        return 'table'
+
+def _visualization_title(df: pd.DataFrame, query: str) -> str:
+    """
+    Build a descriptive title from a query and the data it returned.
+
+    Not memoized: the title depends on the column values (time range,
+    ministry), not only on the frame's shape.
+
+    Args:
+        df (pd.DataFrame): Data to visualize
+        query (str): Original query
+
+    Returns:
+        str: Descriptive title
+    """
+    # Extract key information from data
+    time_cols = _classify_columns(df).time_cols
+    ministry_cols = [col for col in df.columns if col.lower() in _MINISTRY_KEYS]
+
+    title_parts = []
+
+    # Add query focus
+    if 'budget' in query.lower():
+        title_parts.append('Budget Analysis')
+    elif 'spending' in query.lower():
+        title_parts.append('Spending Analysis')
+    else:
+        title_parts.append(query.capitalize())
+
+    # Add time period info
+    if time_cols and len(df) > 0:
+        time_col = time_cols[0]
+        min_year, max_year = df[time_col].agg(['min', 'max']).tolist()
+        if min_year == max_year:
+            title_parts.append(f"({min_year})")
+        else:
+            title_parts.append(f"({min_year}-{max_year})")
+
+    # Add ministry info if available
+    if ministry_cols and len(df) < 5:  # Don't add if too many ministries
+        ministry_col = ministry_cols[0]
+        # Only the count of distinct ministries matters, not the values themselves
+        if df[ministry_col].nunique(dropna=False) == 1:
+            title_parts.append(f"- {df[ministry_col].iloc[0]}")
+
+    return ' '.join(title_parts)
 
 class FinancialDataVisualizer:
     """Class for visualizing Finnish financial data."""
     
+    # Largest bars shown in a bar chart; more are unreadable
+    MAX_BARS = 50
+    # Largest slices shown in a pie chart; the rest are summed into "Other"
+    MAX_PIE_SLICES = 10
+    
     def __init__(self):
         """Initialize the visualizer."""
         # Set default color scheme for Finnish government data
         # Using a blue color palette reminiscent of Finnish flag
-        self.color_scheme = px.colors.sequential.Blues
+        from plotly.colors import sequential
+        self.color_scheme = sequential.Blues
+        self._primary_color = self.color_scheme[5]
         
-        # Common labels in Finnish and English
-        self.label_translations = {
-            'Vuosi': 'Year',
-            'Kk': 'Month',
-            'quarter': 'Quarter',
-            'Nettokertymä': 'Net Amount',
-            'Alkuperäinen_talousarvio': 'Original Budget',
-            'Voimassaoleva_talousarvio': 'Current Budget',
-            'Hallinnonala': 'Administrative Branch',
-            'spending': 'Spending',
-            'budget': 'Budget',
-            'ministry': 'Ministry',
-            'original_budget': 'Original Budget',
-            'current_budget': 'Current Budget',
-            'year': 'Year',
-            'month': 'Month'
-        }
+        # Common labels in Finnish and English, shared by all instances
+        self.label_translations = LABEL_TRANSLATIONS
     
     def detect_visualization_type(self, df: pd.DataFrame) -> str:
         """
@@ -44,53 +276,13 @@ class FinancialDataVisualizer:
         Returns:
             str: Visualization type ('line', 'bar', 'pie', etc.)
         """
-        # Get column names and types
-        columns = list(df.columns)
-        numeric_columns = df.select_dtypes(include=['number']).columns.tolist()
-
-        # Check for time series data
-        time_columns = [col for col in columns if col.lower() in ['year', 'vuosi', 'month', 'kk', 'quarter']]
-
-        # Check for categorical data
-        category_columns = [col for col in columns if col.lower() in ['hallinnonala', 'ministry', 'administrative_branch', 'paaluokka', 'momentti', 'luku']]
-
-        # Logic for visualization type selection
-        if len(df) == 1 and len(numeric_columns) >= 1:
-            # Single row with numeric values - use a single value display
-            return 'single_value'
-        elif len(df) == 1 and len(numeric_columns) > 1:
-            # Single row with multiple values - use bar for comparison
-            return 'bar'
-        elif len(time_columns) >= 1 and len(numeric_columns) >= 1:
-            # Time series data - check for multiple numeric values
-            if len(df) > 1:  # Need at least 2 points for a line chart
-                if len(numeric_columns) > 2:  # Too many lines can be confusing
-                    return 'time_bar'  # Use bar chart instead
-                elif len(numeric_columns) > 1:
-                    return 'time_multi_line'
-                else:
-                    return 'time_line'
-            else:
-                return 'single_value'
-        elif category_columns and len(numeric_columns) >= 1:
-            # Categorical data with numeric values
-            if len(df) <= 8:  # Good for pie charts
-                return 'pie'
-            else:
-                return 'bar'
-        elif len(df) > 10 and len(numeric_columns) >= 1:
-            # Large datasets
-            if any(col.lower() in ['year', 'vuosi'] for col in columns):
-                return 'time_bar'
-            else:
-                return 'bar'
-        elif len(df) <= 10 and len(numeric_columns) >= 1:
-            # Small datasets
-            return 'bar'
-        else:
-            # Default to table when no clear pattern
+        # Nothing to chart; skip building the cache key
+        if df is None or df.empty:
             return 'table'
 
+        # Same columns, dtypes and row count always give the same type
+        return _detect_viz_type_cached(tuple(df.columns), tuple(df.dtypes), len(df))
+
     def _create_visualization_title(self, df: pd.DataFrame, viz_type: str, query: str) -> str:
         """
         Create a more descriptive title based on the data and query.
@@ -103,38 +295,7 @@ class FinancialDataVisualizer:
         Returns:
             str: Descriptive title
         """
-        # Extract key information from data
-        time_cols = [col for col in df.columns if col.lower() in ['year', 'vuosi', 'month', 'kk', 'quarter']]
-        ministry_cols = [col for col in df.columns if col.lower() in ['hallinnonala', 'ministry', 'administrative_branch']]
-
-        title_parts = []
-
-        # Add query focus
-        if 'budget' in query.lower():
-            title_parts.append('Budget Analysis')
-        elif 'spending' in query.lower():
-            title_parts.append('Spending Analysis')
-        else:
-            title_parts.append(query.capitalize())
-
-        # Add time period info
-        if time_cols and len(df) > 0:
-            time_col = time_cols[0]
-            min_year = df[time_col].min()
-            max_year = df[time_col].max()
-            if min_year == max_year:
-                title_parts.append(f"({min_year})")
-            else:
-                title_parts.append(f"({min_year}-{max_year})")
-
-        # Add ministry info if available
-        if ministry_cols and len(df) < 5:  # Don't add if too many ministries
-            ministry_col = ministry_cols[0]
-            ministries = df[ministry_col].unique()
-            if len(ministries) == 1:
-                title_parts.append(f"- {ministries[0]}")
-
-        return ' '.join(title_parts)
+        return _visualization_title(df, query)
     
     def create_visualization(self, df: pd.DataFrame, title: str = '', 
                             viz_type: Optional[str] = None) -> go.Figure:
@@ -158,26 +319,29 @@ class FinancialDataVisualizer:
             if not viz_type:
                 viz_type = self.detect_visualization_type(df)
             
-            # Translate column names for better display
-            df_display = df.copy()
-            df_display.columns = [self.label_translations.get(col, col) for col in df.columns]
+            # Translate column names for better display; a new frame over the same data, no copy
+            translated = df.columns.map(_LABEL_TRANS_SERIES)
+            df_display = df.set_axis(translated.where(translated.notna(), df.columns), axis=1)
+            
+            # Classify the display columns once; every chart builder below reuses it
+            classes = _classify_columns(df_display)
             
             # Create appropriate visualization based on type
             if viz_type == 'single_value':
-                return self._create_single_value_viz(df_display, title)
+                return self._create_single_value_viz(df_display, title, classes)
             elif viz_type == 'time_line':
-                return self._create_time_line_viz(df_display, title)
+                return self._create_time_line_viz(df_display, title, classes)
             elif viz_type == 'time_multi_line':
-                return self._create_time_multi_line_viz(df_display, title)
+                return self._create_time_multi_line_viz(df_display, title, classes)
             elif viz_type == 'pie':
-                return self._create_pie_viz(df_display, title)
+                return self._create_pie_viz(df_display, title, classes)
             elif viz_type == 'bar':
-                return self._create_bar_viz(df_display, title)
+                return self._create_bar_viz(df_display, title, classes)
             elif viz_type == 'time_bar':
-                return self._create_time_bar_viz(df_display, title)
+                return self._create_time_bar_viz(df_display, title, classes)
             else:
                 # Default to table
-                return self._create_table_viz(df_display, title)
+                return self._create_table_viz(df_display, title, classes)
         
         except Exception as e:
             logger.error(f"Error creating visualization: {str(e)}")
@@ -185,7 +349,8 @@ class FinancialDataVisualizer:
 
     def _create_error_figure(self, error_message: str) -> go.Figure:
         """Create an error visualization."""
-        fig = go.Figure()
+        import plotly.graph_objects as go
+        fig = go.Figure(layout=dict(template=_template('massi_small'), title="Visualization Error"))
         
         fig.add_annotation(
             text=error_message,
@@ -196,26 +361,24 @@ class FinancialDataVisualizer:
             align="center"
         )
         
-        fig.update_layout(
-            title="Visualization Error",
-            height=300,
-            margin=dict(l=20, r=20, t=40, b=20)
-        )
-        
         return fig
     
-    def _create_single_value_viz(self, df: pd.DataFrame, title: str) -> go.Figure:
+    def _create_single_value_viz(self, df: pd.DataFrame, title: str,
+                                 classes: Optional[_ColumnClasses] = None) -> go.Figure:
         """Create a visualization for a single value."""
+        import plotly.graph_objects as go
         # Extract the first numeric column and its value
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        if classes is None:
+            classes = _classify_columns(df)
+        numeric_cols = classes.numeric_cols
         if not numeric_cols:
-            return self._create_table_viz(df, title)
+            return self._create_table_viz(df, title, classes)
         
         value_col = numeric_cols[0]
         value = df[value_col].iloc[0]
         
         # Create a figure with a big number display
-        fig = go.Figure()
+        fig = go.Figure(layout=dict(template=_template('massi_small')))
         
         fig.add_trace(go.Indicator(
             mode="number",
@@ -224,48 +387,45 @@ class FinancialDataVisualizer:
             domain={'x': [0, 1], 'y': [0, 1]}
         ))
         
-        fig.update_layout(
-            height=300,
-            margin=dict(l=20, r=20, t=40, b=20)
-        )
-        
         return fig
     
-    def _create_time_line_viz(self, df: pd.DataFrame, title: str) -> go.Figure:
+    def _create_time_line_viz(self, df: pd.DataFrame, title: str,
+                              classes: Optional[_ColumnClasses] = None) -> go.Figure:
         """Create a line chart for time series data with error handling."""
-        # Ensure column names are compatible with BigQuery
-        df.columns = [col.replace(' ', '_').lower() for col in df.columns]
-
+        import plotly.graph_objects as go
         # Identify the time column and numeric column
-        time_cols = [col for col in df.columns if col in ['year', 'vuosi', 'month', 'kk', 'quarter']]
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        if classes is None:
+            classes = _classify_columns(df)
+        time_cols, numeric_cols = classes.time_cols, classes.numeric_cols
 
         if not time_cols or not numeric_cols:
             return self._create_error_figure("No time series data found")
 
         time_col = time_cols[0]
         value_col = numeric_cols[0]
+        # Axes are labelled with BigQuery-style (snake_case) names; df itself is not renamed
+        time_label = time_col.replace(' ', '_').lower()
+        value_label = value_col.replace(' ', '_').lower()
 
         # Check if we have enough data points
         if len(df) < 2:
-            return self._create_single_value_viz(df, title)
+            return self._create_single_value_viz(df, title, classes)
 
         try:
             # Create line chart
-            fig = px.line(
-                df, 
-                x=time_col, 
-                y=value_col,
-                title=title,
-                markers=True,
-                color_discrete_sequence=[self.color_scheme[5]]
-            )
-
-            # Format the layout
-            fig.update_layout(
-                xaxis_title=time_col,
-                yaxis_title=value_col,
-                height=400
+            fig = go.Figure(
+                go.Scatter(
+                    x=df[time_col].to_numpy(),
+                    y=_plot_values(df[value_col]),
+                    mode='lines+markers',
+                    hovertemplate=f"{time_label}=%{{x}}<br>{value_label}=%{{y}}<extra></extra>"
+                ),
+                layout=dict(
+                    title=title,
+                    xaxis_title=time_label,
+                    yaxis_title=value_label,
+                    template=_template('massi_single')
+                )
             )
 
             return fig
@@ -274,147 +434,176 @@ class FinancialDataVisualizer:
             logger.error(f"Error creating line chart: {str(e)}")
             return self._create_error_figure(f"Error creating line chart: {str(e)}")
     
-    def _create_time_multi_line_viz(self, df: pd.DataFrame, title: str) -> go.Figure:
+    def _create_time_multi_line_viz(self, df: pd.DataFrame, title: str,
+                                    classes: Optional[_ColumnClasses] = None) -> go.Figure:
         """Create a line chart for time series data with multiple metrics."""
+        import plotly.graph_objects as go
         # Identify the time column and numeric columns
-        time_cols = [col for col in df.columns if col.lower() in 
-                    ['year', 'vuosi', 'month', 'kk', 'quarter']]
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        if classes is None:
+            classes = _classify_columns(df)
+        time_cols, numeric_cols = classes.time_cols, classes.numeric_cols
         
         if not time_cols or len(numeric_cols) < 2:
-            return self._create_time_line_viz(df, title)
+            return self._create_time_line_viz(df, title, classes)
         
         time_col = time_cols[0]
+        x = df[time_col].to_numpy()
         
-        # Create line chart with multiple lines
-        fig = px.line(
-            df,
-            x=time_col,
-            y=numeric_cols,
+        # Create line chart with one trace per metric; colors follow the template's colorway
+        fig = go.Figure(layout=dict(
             title=title,
-            markers=True,
-            color_discrete_sequence=self.color_scheme
-        )
-        
-        # Format the layout
-        fig.update_layout(
             xaxis_title=time_col,
             yaxis_title="Value",
-            height=400,
-            legend_title_text=""
-        )
+            template=_template('massi_scale')
+        ))
+        for col in numeric_cols:
+            if col == time_col:
+                continue  # A numeric year column is the x axis, not a metric
+            fig.add_trace(go.Scatter(
+                x=x,
+                y=_plot_values(df[col]),
+                mode='lines+markers',
+                name=col,
+                showlegend=True,
+                hovertemplate=f"variable={col}<br>{time_col}=%{{x}}<br>value=%{{y}}<extra></extra>"
+            ))
         
         return fig
     
-    def _create_pie_viz(self, df: pd.DataFrame, title: str) -> go.Figure:
+    def _create_pie_viz(self, df: pd.DataFrame, title: str,
+                        classes: Optional[_ColumnClasses] = None) -> go.Figure:
         """Create a pie chart for categorical data."""
+        import plotly.graph_objects as go
         # Identify the category column and numeric column
-        non_numeric_cols = df.select_dtypes(exclude=['number']).columns.tolist()
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        if classes is None:
+            classes = _classify_columns(df)
+        non_numeric_cols, numeric_cols = classes.non_numeric_cols, classes.numeric_cols
         
         if not non_numeric_cols or not numeric_cols:
-            return self._create_table_viz(df, title)
+            return self._create_table_viz(df, title, classes)
         
         category_col = non_numeric_cols[0]
         value_col = numeric_cols[0]
         
-        # Create pie chart
-        fig = px.pie(
-            df,
-            values=value_col,
-            names=category_col,
-            title=title,
-            color_discrete_sequence=self.color_scheme
-        )
+        if len(df) > self.MAX_PIE_SLICES:
+            # Keep the largest slices and fold the rest into one
+            pie_df = df[[category_col, value_col]].reset_index(drop=True)
+            top = pie_df.nlargest(self.MAX_PIE_SLICES, value_col)
+            other = pd.DataFrame({category_col: ["Other"], value_col: [pie_df[value_col].drop(top.index).sum()]})
+            df = pd.concat([top, other], ignore_index=True)
         
-        # Format the layout
-        fig.update_layout(
-            height=400
+        # Create pie chart
+        fig = go.Figure(
+            go.Pie(
+                labels=df[category_col].to_numpy(),
+                values=_plot_values(df[value_col]),
+                hovertemplate=f"{category_col}=%{{label}}<br>{value_col}=%{{value}}<extra></extra>"
+            ),
+            layout=dict(title=title, template=_template('massi_scale'))
         )
         
         return fig
     
-    def _create_bar_viz(self, df: pd.DataFrame, title: str) -> go.Figure:
+    def _create_bar_viz(self, df: pd.DataFrame, title: str,
+                        classes: Optional[_ColumnClasses] = None) -> go.Figure:
         """Create a bar chart for categorical data."""
+        import plotly.graph_objects as go
         # Identify the category column and numeric column
-        non_numeric_cols = df.select_dtypes(exclude=['number']).columns.tolist()
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        if classes is None:
+            classes = _classify_columns(df)
+        non_numeric_cols, numeric_cols = classes.non_numeric_cols, classes.numeric_cols
         
         if not non_numeric_cols or not numeric_cols:
-            return self._create_table_viz(df, title)
+            return self._create_table_viz(df, title, classes)
         
         category_col = non_numeric_cols[0]
         value_col = numeric_cols[0]
         
-        # Sort the data by value for better visualization
-        df_sorted = df.sort_values(by=value_col, ascending=False)
+        # Sort the data by value for better visualization; only the largest bars are kept
+        truncated = len(df) > self.MAX_BARS
+        if truncated:
+            df_sorted = df.nlargest(self.MAX_BARS, value_col)
+        else:
+            df_sorted = df.sort_values(by=value_col, ascending=False)
         
         # Create bar chart
-        fig = px.bar(
-            df_sorted,
-            x=category_col,
-            y=value_col,
-            title=title,
-            color_discrete_sequence=[self.color_scheme[5]]
+        fig = go.Figure(
+            go.Bar(
+                x=df_sorted[category_col].to_numpy(),
+                y=_plot_values(df_sorted[value_col]),
+                hovertemplate=f"{category_col}=%{{x}}<br>{value_col}=%{{y}}<extra></extra>"
+            ),
+            layout=dict(
+                title=title,
+                xaxis_title=category_col,
+                yaxis_title=value_col,
+                template=_template('massi_single')
+            )
         )
         
-        # Format the layout
-        fig.update_layout(
-            xaxis_title=category_col,
-            yaxis_title=value_col,
-            height=400
-        )
+        if truncated:
+            fig.add_annotation(
+                text=f"Showing top {self.MAX_BARS} of {len(df)}",
+                xref="paper", yref="paper",
+                x=1, y=1.05,
+                showarrow=False,
+                xanchor="right"
+            )
         
         return fig
     
-    def _create_time_bar_viz(self, df: pd.DataFrame, title: str) -> go.Figure:
+    def _create_time_bar_viz(self, df: pd.DataFrame, title: str,
+                             classes: Optional[_ColumnClasses] = None) -> go.Figure:
         """Create a bar chart for time series data."""
+        import plotly.graph_objects as go
         # Identify the time column and numeric column
-        time_cols = [col for col in df.columns if col.lower() in 
-                    ['year', 'vuosi', 'month', 'kk', 'quarter']]
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        if classes is None:
+            classes = _classify_columns(df)
+        time_cols, numeric_cols = classes.time_cols, classes.numeric_cols
         
         if not time_cols or not numeric_cols:
-            return self._create_table_viz(df, title)
+            return self._create_table_viz(df, title, classes)
         
         time_col = time_cols[0]
         value_col = numeric_cols[0]
         
         # Create bar chart
-        fig = px.bar(
-            df,
-            x=time_col,
-            y=value_col,
-            title=title,
-            color_discrete_sequence=[self.color_scheme[5]]
-        )
-        
-        # Format the layout
-        fig.update_layout(
-            xaxis_title=time_col,
-            yaxis_title=value_col,
-            height=400
+        fig = go.Figure(
+            go.Bar(
+                x=df[time_col].to_numpy(),
+                y=_plot_values(df[value_col]),
+                hovertemplate=f"{time_col}=%{{x}}<br>{value_col}=%{{y}}<extra></extra>"
+            ),
+            layout=dict(
+                title=title,
+                xaxis_title=time_col,
+                yaxis_title=value_col,
+                template=_template('massi_single')
+            )
         )
         
         return fig
     
-    def _create_table_viz(self, df: pd.DataFrame, title: str) -> go.Figure:
+    def _create_table_viz(self, df: pd.DataFrame, title: str,
+                          classes: Optional[_ColumnClasses] = None) -> go.Figure:
         """Create a table visualization for the data."""
-        # Format numeric columns
-        df_display = df.copy()
-        for col in df.select_dtypes(include=['number']).columns:
-            df_display[col] = df[col].apply(lambda x: f"{x:,.2f}" if pd.notnull(x) else "")
+        import plotly.graph_objects as go
+        # Format numeric columns; other columns are passed through as they are
+        if classes is None:
+            classes = _classify_columns(df)
+        numeric_cols = set(classes.numeric_cols)
+        cell_values = [_format_numbers(df[col]) if col in numeric_cols else df[col] for col in df.columns]
         
         # Create table
         fig = go.Figure(data=[go.Table(
             header=dict(
-                values=list(df_display.columns),
-                fill_color=self.color_scheme[5],
+                values=list(df.columns),
+                fill_color=self._primary_color,
                 align='left',
                 font=dict(color='white', size=12)
             ),
             cells=dict(
-                values=[df_display[col] for col in df_display.columns],
+                values=cell_values,
                 fill_color='lavender',
                 align='left'
             )
@@ -423,7 +612,7 @@ class FinancialDataVisualizer:
         # Add title
         fig.update_layout(
             title=title,
-            height=400
+            template=_template('massi_scale')
         )
         
         return fig
\ No newline at end of file